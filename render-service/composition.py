@@ -0,0 +1,107 @@
+"""
+Modèles de composition VideoSequencer
+
+Module léger (pydantic uniquement) importé par l'API et par les workers de rendu.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from config import CLIPS_DIR, VIDEO_EXTENSIONS, OUTPUT_WIDTH, OUTPUT_HEIGHT
+
+class GridSize(BaseModel):
+    rows: int
+    cols: int
+
+class Instrument(BaseModel):
+    id: str
+    name: str
+    gridPosition: int
+    offset: float = 0.0  # Offset de départ dans la vidéo (en secondes)
+    maxDuration: float = 0.0  # Durée maximale utilisable (en secondes, 0 = pas de limite)
+
+class Clip(BaseModel):
+    id: str
+    instrumentId: str
+    startTime: float
+    duration: float
+
+class RenderRequest(BaseModel):
+    bpm: int
+    gridSize: GridSize
+    instruments: List[Instrument]
+    clips: List[Clip]
+
+class RenderVariant(BaseModel):
+    """Variante d'un rendu groupé : les champs absents reprennent ceux de la composition"""
+    name: Optional[str] = None
+    bpm: Optional[int] = None
+    gridSize: Optional[GridSize] = None
+    width: int = OUTPUT_WIDTH
+    height: int = OUTPUT_HEIGHT
+    profile: str = "default"
+
+class BatchRenderRequest(BaseModel):
+    composition: RenderRequest
+    variants: List[RenderVariant]
+
+class PlanRequest(BaseModel):
+    """Requête du coordinateur : uploads = nom d'instrument -> <sha256>/<fichier> dans TEMP_DIR (partagé)"""
+    request: RenderRequest
+    uploads: Dict[str, str] = {}
+
+class SegmentRequest(PlanRequest):
+    """
+    Segment [start, end) d'un rendu distribué, écrit sous filename dans SEGMENTS_DIR
+    track : "video" (segment vidéo sans audio) ou "audio" (piste audio complète [0, end))
+    """
+    start: float
+    end: float
+    profile: str = "default"
+    filename: str
+    track: str = "video"
+
+def apply_variant(request: RenderRequest, variant: RenderVariant) -> RenderRequest:
+    """Composition telle que rendue pour cette variante (bpm / grille remplacés)"""
+    update = {}
+    if variant.bpm is not None:
+        update["bpm"] = variant.bpm
+    if variant.gridSize is not None:
+        update["gridSize"] = variant.gridSize
+    return request.model_copy(update=update)
+
+def instruments_outside_grid(request: RenderRequest) -> List[Instrument]:
+    """Instruments dont la position n'existe pas dans la grille (hors du canevas)"""
+    cells = request.gridSize.rows * request.gridSize.cols
+    return [inst for inst in request.instruments if inst.gridPosition >= cells]
+
+def beats_to_seconds(beats: float, bpm: int) -> float:
+    return (beats / bpm) * 60
+
+def composition_duration(request: RenderRequest) -> float:
+    """Durée totale de la composition (fin du dernier clip), en secondes"""
+    last_clip_end = max(
+        (clip.startTime + clip.duration for clip in request.clips),
+        default=0
+    )
+    return beats_to_seconds(last_clip_end, request.bpm)
+
+def usable_duration(inst: Instrument, source_duration: float) -> float:
+    """Durée jouée d'un clip : la vidéo après l'offset, limitée par maxDuration (0 = pas de limite)"""
+    available_duration = source_duration - inst.offset
+    if inst.maxDuration > 0:
+        return min(inst.maxDuration, available_duration)
+    return available_duration
+
+def find_video_path(name: str, uploaded_videos: Dict[str, str]) -> Optional[str]:
+    """Vidéo d'un instrument : d'abord dans les uploads, puis dans CLIPS_DIR"""
+    video_path = uploaded_videos.get(name)
+    if video_path:
+        return video_path
+    for ext in VIDEO_EXTENSIONS:
+        potential_path = os.path.join(CLIPS_DIR, f"{name}{ext}")
+        if os.path.exists(potential_path):
+            return potential_path
+    return None
@@ -0,0 +1,112 @@
+"""
+Configuration du service de rendu VideoSequencer
+(partagée entre le processus API et les workers de rendu)
+"""
+
+import os
+
+# Chemins - utiliser des chemins relatifs pour exécution locale
+CLIPS_DIR = os.environ.get('CLIPS_DIR', "/app/clips")
+OUTPUT_DIR = os.environ.get('OUTPUT_DIR', "/app/output")
+TEMP_DIR = os.environ.get('TEMP_DIR', "/tmp/VideoSequencer_uploads")
+# Pool de décodeurs : nombre max de lecteurs ffmpeg ouverts et budget du cache de frames
+DECODER_MAX_READERS = int(os.environ.get('DECODER_MAX_READERS', "32"))
+FRAME_CACHE_MB = int(os.environ.get('FRAME_CACHE_MB', "512"))
+# Budget disque des rendus conservés en cache dans OUTPUT_DIR
+RENDER_CACHE_MB = int(os.environ.get('RENDER_CACHE_MB', "5120"))
+# Bail des rendus servis : un rendu consulté depuis moins de N minutes n'est jamais évincé
+RENDER_CACHE_LEASE_MINUTES = int(os.environ.get('RENDER_CACHE_LEASE_MINUTES', "30"))
+
+# Workers de rendu : processus démarrés au boot, préchauffés (ffmpeg, codecs, bibliothèque)
+RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', "2"))
+RENDER_PREWARM_CLIPS = os.environ.get('RENDER_PREWARM_CLIPS', "0") == "1"
+
+# Rendu distribué : si RENDER_NODES est défini (URLs séparées par des virgules), ce service
+# devient coordinateur et découpe chaque rendu en segments envoyés aux nœuds listés.
+# TEMP_DIR doit être un stockage partagé, monté au même chemin sur tous les nœuds.
+RENDER_NODES = [node.strip().rstrip('/') for node in os.environ.get('RENDER_NODES', "").split(',') if node.strip()]
+SEGMENT_SECONDS = float(os.environ.get('SEGMENT_SECONDS', "10"))
+SEGMENT_RETRIES = int(os.environ.get('SEGMENT_RETRIES', "2"))
+SEGMENT_TIMEOUT = float(os.environ.get('SEGMENT_TIMEOUT', "600"))
+NODE_CONCURRENCY = int(os.environ.get('NODE_CONCURRENCY', "1"))
+# Segment toujours en cours après ce délai : relancé en parallèle sur un autre nœud
+SEGMENT_STRAGGLER_TIMEOUT = float(os.environ.get('SEGMENT_STRAGGLER_TIMEOUT', "120"))
+
+VIDEO_EXTENSIONS = ['.mp4', '.mov', '.avi', '.mkv', '.webm']
+
+# Profil d'encodage de la vidéo finale (fait partie de la clé du cache de rendu)
+ENCODE_PROFILE = {
+    "fps": 30,
+    "codec": 'libx264',
+    "audio_codec": 'aac',
+    "bitrate": '5000k',
+    "preset": 'medium',
+    "ffmpeg_params": ['-avoid_negative_ts', 'make_zero'],
+}
+
+# Profils d'encodage disponibles pour les variantes d'un rendu groupé
+ENCODE_PROFILES = {
+    "default": ENCODE_PROFILE,
+    "preview": {
+        **ENCODE_PROFILE,
+        "bitrate": '2000k',
+        "preset": 'veryfast',
+    },
+}
+
+# Sortie progressive HLS (fMP4) : les segments sont publiés au fil de l'encodage,
+# la lecture peut commencer avant la fin du rendu
+HLS_SEGMENT_SECONDS = int(os.environ.get('HLS_SEGMENT_SECONDS', "4"))
+HLS_PLAYLIST = "index.m3u8"
+HLS_PROFILE = {
+    **ENCODE_PROFILE,
+    "ffmpeg_params": ENCODE_PROFILE["ffmpeg_params"] + [
+        '-f', 'hls',
+        '-hls_time', str(HLS_SEGMENT_SECONDS),
+        '-hls_playlist_type', 'event',
+        '-hls_segment_type', 'fmp4',
+        # temp_file : un segment n'apparaît qu'une fois complètement écrit
+        '-hls_flags', 'independent_segments+temp_file',
+        # Une image clé au début de chaque segment
+        '-force_key_frames', f'expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})',
+    ],
+}
+
+# Taille de sortie par défaut
+OUTPUT_WIDTH = 1920
+OUTPUT_HEIGHT = 1080
+
+# Index des médias (keyframes, métadonnées, posters, vignettes), persisté dans
+# un répertoire .index à côté de chaque vidéo
+INDEX_DIRNAME = ".index"
+INDEX_ON_BOOT = os.environ.get('INDEX_ON_BOOT', "1") == "1"
+# Grilles courantes pour lesquelles un poster assombri est pré-calculé
+INDEX_GRID_SIZES = [
+    tuple(int(n) for n in size.split('x'))
+    for size in os.environ.get('INDEX_GRID_SIZES', "2x2,3x3,4x4").split(',') if size.strip()
+]
+INDEX_THUMBNAIL_WIDTH = 320
+INDEX_FILMSTRIP_HEIGHT = 90
+INDEX_FILMSTRIP_INTERVAL = float(os.environ.get('INDEX_FILMSTRIP_INTERVAL', "1"))
+INDEX_FILMSTRIP_MAX_FRAMES = 60
+
+# Segments du rendu distribué (dans le stockage partagé)
+SEGMENTS_DIR = os.path.join(TEMP_DIR, "segments")
+
+# Créer les répertoires seulement s'ils n'existent pas et qu'on a les permissions
+try:
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(TEMP_DIR, exist_ok=True)
+    os.makedirs(SEGMENTS_DIR, exist_ok=True)
+except OSError as e:
+    print(f"⚠️ Impossible de créer les répertoires: {e}")
+    # Utiliser des chemins locaux si /app n'est pas accessible
+    if not os.path.exists(OUTPUT_DIR):
+        OUTPUT_DIR = "./output"
+        os.makedirs(OUTPUT_DIR, exist_ok=True)
+    if not os.path.exists(CLIPS_DIR):
+        CLIPS_DIR = "../clips"
+
+# Rendus HLS : un répertoire par rendu (playlist + segments)
+LIVE_DIR = os.path.join(OUTPUT_DIR, "live")
+os.makedirs(LIVE_DIR, exist_ok=True)
@@ -0,0 +1,279 @@
+"""
+Pool de décodeurs partagé pour le rendu VideoSequencer
+
+Remplace le cache de VideoFileClip par placement : un nombre borné de lecteurs
+ffmpeg (vidéo et audio) est ouvert en même temps, et les frames décodées (déjà
+redimensionnées à la taille de la cellule) sont gardées dans un cache LRU sous
+budget mémoire. Une même frame d'une même fenêtre source n'est donc décodée
+qu'une fois par rendu.
+
+Les placements sont enregistrés avec leur intervalle sur la ligne de temps : le
+lecteur d'un fichier n'est retenu que pendant qu'un de ses placements joue, et
+fermé dès que le dernier est terminé.
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from moviepy import AudioClip, VideoFileClip, VideoClip
+from moviepy.audio.io.AudioFileClip import AudioFileClip
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+AUDIO_FPS = 44100
+# Les lecteurs audio de MoviePy produisent toujours du stéréo
+AUDIO_CHANNELS = 2
+
+
+@dataclass(frozen=True)
+class SourceWindow:
+    """Fenêtre source : fichier (déjà découpé) affiché dans une cellule de taille donnée"""
+    path: str
+    width: int
+    height: int
+
+
+@dataclass
+class SourceInfo:
+    duration: float
+    fps: float
+    # None : inconnu (métadonnées venant de l'index des médias), sondé à la demande
+    has_audio: Optional[bool] = None
+
+
+class DecoderPool:
+    """
+    Lecteurs ffmpeg bornés + cache LRU de frames décodées
+
+    - max_readers : nombre maximal de lecteurs ouverts simultanément, vidéo et audio
+      confondus (chaque lecteur est un processus ffmpeg)
+    - max_cache_bytes : budget mémoire du cache de frames
+    - cache_source_frames : garder aussi les frames à la taille source, pour les
+      rendus groupés où un même fichier est affiché à plusieurs tailles de cellule
+
+    À la limite, le lecteur fermé est d'abord un lecteur libre (sonde, image fixe,
+    placements terminés ou pas encore commencés), le moins récemment utilisé. Si plus
+    de fichiers jouent en même temps que la limite ne le permet, un lecteur en cours
+    d'utilisation est fermé puis rouvert au besoin : la limite reste stricte.
+    """
+
+    def __init__(self, max_readers: int = 32, max_cache_bytes: int = 512 * 1024 * 1024,
+                 cache_source_frames: bool = False):
+        self.max_readers = max(1, max_readers)
+        self.max_cache_bytes = max_cache_bytes
+        self.cache_source_frames = cache_source_frames
+
+        # (type, chemin) -> lecteur ; type "video" (VideoFileClip) ou "audio" (AudioFileClip)
+        self._readers: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        self._infos: Dict[str, SourceInfo] = {}
+        # Intervalles [début, fin) des placements de chaque fichier sur la ligne de temps
+        self._placements: Dict[str, List[Tuple[float, float]]] = {}
+        # Dernier instant de la ligne de temps lu par type : l'audio peut être produit
+        # en avance sur la vidéo (encodage audio préalable, ou progressif en parallèle)
+        self._clock: Dict[str, float] = {}
+        self._frames: "OrderedDict[Tuple[SourceWindow, int], np.ndarray]" = OrderedDict()
+        self._cache_bytes = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.source_decodes = 0
+        self.frame_evictions = 0
+        self.reader_opens = 0
+        self.reader_evictions = 0
+        self.max_open_readers = 0
+        self.overcommitted = False
+
+    # --- Lecteurs ---
+
+    def _playing(self, path: str, timeline_t: Optional[float]) -> bool:
+        if timeline_t is None:
+            return False
+        return any(start <= timeline_t < end for start, end in self._placements.get(path, ()))
+
+    def _release_finished(self, kind: str, timeline_t: float):
+        """Ferme les lecteurs de ce type dont tous les placements sont terminés à timeline_t"""
+        for reader_key in list(self._readers):
+            reader_kind, path = reader_key
+            placements = self._placements.get(path)
+            if reader_kind == kind and placements and max(end for _, end in placements) <= timeline_t:
+                self._readers.pop(reader_key).close()
+
+    def _reader(self, kind: str, path: str, timeline_t: Optional[float] = None):
+        if timeline_t is not None:
+            self._clock[kind] = timeline_t
+        reader_key = (kind, path)
+        reader = self._readers.get(reader_key)
+        if reader is not None:
+            self._readers.move_to_end(reader_key)
+            return reader
+
+        if len(self._readers) >= self.max_readers:
+            # Lecteur libre le moins récemment utilisé, sinon (trop de fichiers joués en
+            # même temps) le moins récemment utilisé de tous
+            idle = [key for key in self._readers if not self._playing(key[1], self._clock.get(key[0]))]
+            if not idle and not self.overcommitted:
+                self.overcommitted = True
+                print(f"⚠️ Plus de {self.max_readers} lecteurs nécessaires en même temps : "
+                      f"lectures en alternance (augmenter DECODER_MAX_READERS)")
+            self._readers.pop(idle[0] if idle else next(iter(self._readers))).close()
+            self.reader_evictions += 1
+
+        if kind == "video":
+            reader = VideoFileClip(path, audio=False)
+        else:
+            reader = AudioFileClip(path, fps=AUDIO_FPS)
+        self._readers[reader_key] = reader
+        self.reader_opens += 1
+        self.max_open_readers = max(self.max_open_readers, len(self._readers))
+        return reader
+
+    def info(self, path: str) -> SourceInfo:
+        """Durée, fps et présence d'audio d'un fichier (sonde ffmpeg mise en cache, sans lecteur)"""
+        with self._lock:
+            info = self._infos.get(path)
+            if info is None or info.has_audio is None:
+                infos = ffmpeg_parse_infos(path)
+                info = SourceInfo(
+                    duration=infos.get("video_duration", 0.0),
+                    fps=infos.get("video_fps", 1.0),
+                    has_audio=infos.get("audio_found", False),
+                ) if info is None else SourceInfo(info.duration, info.fps, infos.get("audio_found", False))
+                self._infos[path] = info
+            return info
+
+    def seed_info(self, path: str, duration: float, fps: float):
+        """Métadonnées connues par ailleurs (index des médias) : évite une sonde ffmpeg"""
+        with self._lock:
+            self._infos.setdefault(path, SourceInfo(duration=duration, fps=fps))
+
+    def _timing(self, path: str) -> SourceInfo:
+        # Durée et fps suffisent pour les frames : une info amorcée par l'index est utilisable
+        info = self._infos.get(path)
+        return info if info is not None else self.info(path)
+
+    # --- Frames ---
+
+    def get_frame(self, window: SourceWindow, t: float, timeline_t: Optional[float] = None) -> np.ndarray:
+        """
+        Frame de la fenêtre au temps t (relatif au début du fichier), redimensionnée
+        timeline_t : instant correspondant sur la ligne de temps (placements, voir make_clip)
+        """
+        with self._lock:
+            if timeline_t is not None:
+                self._release_finished("video", timeline_t)
+            info = self._timing(window.path)
+            # Même arrondi que le lecteur ffmpeg de MoviePy : la clé correspond
+            # exactement à la frame source qui serait décodée
+            index = int(info.fps * max(t, 0.0) + 0.00001)
+            key = (window, index)
+
+            frame = self._frames.get(key)
+            if frame is not None:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                return frame
+
+            self.misses += 1
+            raw = self._source_frame(window.path, index, info, timeline_t)
+            if raw.shape[1] != window.width or raw.shape[0] != window.height:
+                image = Image.fromarray(raw).resize((window.width, window.height), Image.Resampling.LANCZOS)
+                frame = np.asarray(image)
+            else:
+                frame = raw
+            self._store(key, frame)
+            return frame
+
+    def _source_frame(self, path: str, index: int, info: SourceInfo, timeline_t: Optional[float]) -> np.ndarray:
+        if not self.cache_source_frames:
+            self.source_decodes += 1
+            return self._reader("video", path, timeline_t).get_frame(index / info.fps)
+
+        key = (path, index)
+        raw = self._frames.get(key)
+        if raw is not None:
+            self._frames.move_to_end(key)
+            return raw
+        self.source_decodes += 1
+        raw = self._reader("video", path, timeline_t).get_frame(index / info.fps)
+        self._store(key, raw)
+        return raw
+
+    def _store(self, key, frame: np.ndarray):
+        if frame.nbytes > self.max_cache_bytes:
+            return
+        self._frames[key] = frame
+        self._cache_bytes += frame.nbytes
+        while self._cache_bytes > self.max_cache_bytes:
+            _, old = self._frames.popitem(last=False)
+            self._cache_bytes -= old.nbytes
+            self.frame_evictions += 1
+
+    # --- Audio ---
+
+    def audio_frame(self, path: str, start: float, t):
+        """
+        Échantillons audio du fichier au temps t (scalaire ou tableau, relatif au fichier),
+        lus par un lecteur ffmpeg ouvert à la demande : seule sa fenêtre tampon est en mémoire
+        start : début du placement sur la ligne de temps
+        """
+        with self._lock:
+            timeline_t = start + float(np.min(t))
+            self._release_finished("audio", timeline_t)
+            return self._reader("audio", path, timeline_t).get_frame(t)
+
+    # --- Placements ---
+
+    def make_clip(self, window: SourceWindow, start: float) -> VideoClip:
+        """
+        Clip MoviePy placé à start sur la ligne de temps, dont les frames (et l'audio)
+        sont servies par le pool
+        """
+        info = self.info(window.path)
+        with self._lock:
+            self._placements.setdefault(window.path, []).append((start, start + info.duration))
+
+        # frame_function affectée après coup : VideoClip() et AudioClip() liraient sinon
+        # une frame (et ouvriraient un lecteur) dès la construction
+        clip = VideoClip(duration=info.duration)
+        clip.frame_function = lambda t: self.get_frame(window, t, start + t)
+        clip.size = (window.width, window.height)
+        clip.fps = info.fps
+        if info.has_audio:
+            audio = AudioClip(duration=info.duration, fps=AUDIO_FPS)
+            audio.frame_function = lambda t: self.audio_frame(window.path, start, t)
+            audio.nchannels = AUDIO_CHANNELS
+            clip = clip.with_audio(audio)
+        return clip.with_start(start)
+
+    # --- Statistiques / nettoyage ---
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "source_decodes": self.source_decodes,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "cached_frames": len(self._frames),
+                "cache_bytes": self._cache_bytes,
+                "frame_evictions": self.frame_evictions,
+                "reader_opens": self.reader_opens,
+                "reader_evictions": self.reader_evictions,
+                "max_open_readers": self.max_open_readers,
+                "max_readers": self.max_readers,
+            }
+
+    def close(self):
+        with self._lock:
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+            self._placements.clear()
+            self._clock.clear()
+            self._frames.clear()
+            self._cache_bytes = 0
@@ -0,0 +1,221 @@
+"""
+Rendu distribué VideoSequencer (mode coordinateur)
+
+Le coordinateur découpe un rendu en segments vidéo temporels alignés sur les
+frames, les envoie aux nœuds de rendu via POST /render/segment, relance un segment
+en échec sur un autre nœud (et double sur un second nœud un segment trop lent),
+puis concatène les segments avec ffmpeg (sans réencodage). La piste audio est
+encodée une seule fois pour tout le rendu (un encodage AAC par segment décalerait
+l'audio à chaque jointure) puis multiplexée avec la vidéo. Sources, découpes et
+segments transitent par TEMP_DIR, partagé entre tous les nœuds.
+"""
+
+import asyncio
+import json
+import os
+import time
+import urllib.request
+from typing import Dict, List, Optional
+
+
+def _post_json(url: str, payload: dict, timeout: float) -> dict:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode('utf-8'),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def segment_bounds(duration: float, segment_seconds: float, fps: float) -> List[tuple]:
+    """Plages [start, end) couvrant la durée, bornes arrondies à la frame"""
+    frames_total = int(round(duration * fps))
+    frames_per_segment = max(1, int(round(segment_seconds * fps)))
+    bounds = []
+    for first in range(0, frames_total, frames_per_segment):
+        last = min(first + frames_per_segment, frames_total)
+        bounds.append((first / fps, last / fps))
+    return bounds
+
+
+class SegmentCoordinator:
+    def __init__(self, nodes: List[str], segments_dir: str, segment_seconds: float,
+                 retries: int, timeout: float, node_concurrency: int, straggler_timeout: float):
+        self.nodes = nodes
+        self.segments_dir = segments_dir
+        self.segment_seconds = segment_seconds
+        self.retries = retries
+        self.timeout = timeout
+        # Au-delà de ce délai, un segment en cours est relancé en parallèle sur un autre nœud
+        self.straggler_timeout = straggler_timeout
+        # Nombre de segments envoyés en parallèle à chaque nœud
+        self.slots = {node: asyncio.Semaphore(max(1, node_concurrency)) for node in nodes}
+        self.active = {node: 0 for node in nodes}
+
+    def _pick_node(self, exclude: List[str]) -> str:
+        """Nœud le moins chargé, en évitant ceux qui ont déjà échoué pour ce segment"""
+        candidates = [node for node in self.nodes if node not in exclude] or self.nodes
+        return min(candidates, key=lambda node: self.active[node])
+
+    async def render(self, key: str, request_data: dict, uploads: Dict[str, str],
+                     output_path: str, profile: str, fps: float) -> str:
+        """
+        Rendu complet réparti sur les nœuds
+        uploads : nom d'instrument -> fichier uploadé, relatif à TEMP_DIR (<sha256>/<fichier>)
+        """
+        self._sweep_orphans()
+        plan = await self._post_any("/render/plan", {"request": request_data, "uploads": uploads})
+        bounds = segment_bounds(plan["duration"], self.segment_seconds, fps)
+        if not bounds:
+            raise RuntimeError(f"Rendu vide: {plan['duration']:.3f}s, aucune frame à {fps} fps")
+        print(f"🧩 Rendu distribué: {plan['duration']:.2f}s en {len(bounds)} segments sur {len(self.nodes)} nœuds")
+
+        base_payload = {"request": request_data, "uploads": uploads, "profile": profile}
+        jobs = [
+            self._render_segment(key, str(index), {**base_payload, "start": start, "end": end}, ".mp4")
+            for index, (start, end) in enumerate(bounds)
+        ]
+        # Piste audio de tout le rendu, calée sur la dernière frame
+        jobs.append(self._render_segment(
+            key, "audio", {**base_payload, "start": 0.0, "end": bounds[-1][1], "track": "audio"}, ".m4a"
+        ))
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        produced = [result for result in results if isinstance(result, str)]
+        try:
+            errors = [result for result in results if isinstance(result, BaseException)]
+            if errors:
+                raise errors[0]
+            await self._concat(results[:-1], results[-1], output_path)
+        finally:
+            for path in produced:
+                if os.path.exists(path):
+                    os.remove(path)
+        return output_path
+
+    async def _post_any(self, path: str, payload: dict) -> dict:
+        """Requête vers le premier nœud qui répond"""
+        errors = []
+        for node in sorted(self.nodes, key=lambda node: self.active[node]):
+            try:
+                return await asyncio.to_thread(_post_json, f"{node}{path}", payload, self.timeout)
+            except Exception as e:
+                errors.append(f"{node}: {e}")
+        raise RuntimeError(f"Aucun nœud disponible pour {path}: {'; '.join(errors)}")
+
+    async def _render_segment(self, key: str, label: str, payload: dict, extension: str) -> str:
+        """
+        Segment vidéo (label = numéro) ou piste audio (label = "audio"), écrit dans segments_dir
+        Une tentative plus lente que straggler_timeout est doublée sur un autre nœud (la première
+        terminée l'emporte), une tentative en échec est relancée ailleurs : au plus retries + 1
+        tentatives. Les fichiers des tentatives perdantes sont supprimés dès qu'elles se terminent.
+        """
+        start, end = payload["start"], payload["end"]
+        events = asyncio.Queue()
+        attempts: Dict[asyncio.Future, tuple] = {}
+        tried = []
+
+        def launch():
+            node = self._pick_node(exclude=tried)
+            tried.append(node)
+            # Comptée dès l'attribution (attente d'un slot comprise) : les segments lancés
+            # ensemble se répartissent sur les nœuds au lieu de s'empiler sur le premier
+            self.active[node] += 1
+            # Un nom par tentative : deux tentatives simultanées n'écrivent jamais le même fichier
+            filename = f"seg_{key[:16]}_{label.zfill(4)}_{len(tried) - 1}{extension}"
+            task = asyncio.ensure_future(self._attempt(
+                node, {**payload, "filename": filename}, lambda: events.put_nowait(("slow", task))
+            ))
+            task.add_done_callback(lambda _: self._finished(node, task, events))
+            attempts[task] = (node, os.path.join(self.segments_dir, filename))
+
+        launch()
+        while True:
+            kind, task = await events.get()
+            node, path = attempts[task]
+            if kind == "slow":
+                if not task.done() and len(tried) <= self.retries:
+                    print(f"⏱️ Segment {label} lent sur {node}, relance spéculative sur un autre nœud")
+                    launch()
+                continue
+
+            error = task.exception()
+            if error is None:
+                print(f"  ✓ Segment {label} ({start:.2f}s → {end:.2f}s) rendu par {node}")
+                self._discard(attempts, keep=task)
+                return path
+
+            print(f"⚠️ Segment {label} échoué sur {node}: {str(error) or type(error).__name__}")
+            if len(tried) <= self.retries:
+                launch()
+            elif all(attempt.done() for attempt in attempts):
+                self._discard(attempts, keep=None)
+                raise RuntimeError(f"Segment {label} en échec sur {', '.join(tried)}")
+
+    def _finished(self, node: str, task: asyncio.Future, events: asyncio.Queue):
+        self.active[node] -= 1
+        events.put_nowait(("done", task))
+
+    async def _attempt(self, node: str, payload: dict, on_slow) -> None:
+        """Une tentative sur un nœud ; on_slow est appelé si elle dépasse straggler_timeout"""
+        async with self.slots[node]:
+            request = asyncio.ensure_future(
+                asyncio.to_thread(_post_json, f"{node}/render/segment", payload, self.timeout)
+            )
+            # Délai compté à partir du début du rendu sur le nœud, pas de l'attente d'un slot
+            done, _ = await asyncio.wait({request}, timeout=min(self.straggler_timeout, self.timeout))
+            if not done:
+                on_slow()
+                await asyncio.wait_for(request, timeout=max(0.0, self.timeout - self.straggler_timeout))
+            request.result()
+
+    def _discard(self, attempts: Dict[asyncio.Future, tuple], keep: Optional[asyncio.Future]):
+        """Supprime le fichier de chaque tentative perdante, dès qu'elle se termine"""
+        for task, (_, path) in attempts.items():
+            if task is not keep:
+                task.add_done_callback(lambda done, path=path: self._remove(done, path))
+
+    @staticmethod
+    def _remove(task: asyncio.Future, path: str):
+        # Erreur déjà rapportée (ou tentative devenue inutile) : seulement la marquer comme lue
+        task.cancelled() or task.exception()
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _sweep_orphans(self):
+        """
+        Segments orphelins : une tentative abandonnée (délai HTTP dépassé) peut continuer
+        sur son nœud et écrire son fichier après coup. Un fichier qui n'a plus été modifié
+        depuis deux fois le délai d'une tentative n'est plus attendu par personne.
+        """
+        limit = time.time() - 2 * self.timeout
+        for filename in os.listdir(self.segments_dir):
+            path = os.path.join(self.segments_dir, filename)
+            try:
+                if filename.startswith("seg_") and os.path.getmtime(path) < limit:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    async def _concat(self, segment_paths: List[str], audio_path: str, output_path: str):
+        """
+        Concaténation des segments vidéo sans réencodage (même profil), multiplexée
+        avec la piste audio encodée d'un seul tenant
+        """
+        list_path = os.path.join(self.segments_dir, f"{os.path.basename(output_path)}.txt")
+        with open(list_path, 'w') as f:
+            for path in segment_paths:
+                f.write(f"file '{path}'\n")
+        try:
+            process = await asyncio.create_subprocess_exec(
+                'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', list_path, '-i', audio_path,
+                '-map', '0:v', '-map', '1:a', '-c', 'copy', '-movflags', '+faststart', output_path,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            _, stderr = await process.communicate()
+            if process.returncode != 0:
+                raise RuntimeError(f"Concaténation ffmpeg échouée: {stderr.decode(errors='replace')[-500:]}")
+        finally:
+            os.remove(list_path)
@@ -0,0 +1,181 @@
+"""
+Construction de l'index des médias VideoSequencer (exécuté dans les workers de rendu)
+
+Une passe par fichier, refaite seulement quand la vidéo change :
+table des keyframes (ffmpeg, keyframes seules décodées), métadonnées,
+posters assombris aux tailles de cellule courantes, vignette et filmstrip.
+"""
+
+import json
+import os
+import re
+import subprocess
+import time
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from config import (
+    OUTPUT_WIDTH, OUTPUT_HEIGHT, VIDEO_EXTENSIONS, INDEX_GRID_SIZES,
+    INDEX_THUMBNAIL_WIDTH, INDEX_FILMSTRIP_HEIGHT, INDEX_FILMSTRIP_INTERVAL, INDEX_FILMSTRIP_MAX_FRAMES,
+)
+from decoder_pool import DecoderPool, SourceWindow
+from media_index import INDEX_FILENAME, INDEX_VERSION, index_dir_for, load_index, poster_filename
+
+PTS_TIME_RE = re.compile(r"pts_time:\s*([0-9.]+)")
+
+
+def extract_keyframes(video_path: str) -> list:
+    """Timestamps des keyframes de la première piste vidéo"""
+    result = subprocess.run(
+        [
+            FFMPEG_BINARY, '-hide_banner', '-nostats',
+            '-skip_frame', 'nokey', '-i', video_path,
+            '-map', '0:v:0', '-vf', 'showinfo', '-f', 'null', '-'
+        ],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"extraction des keyframes échouée: {result.stderr[-500:]}")
+    return sorted({round(float(t), 6) for t in PTS_TIME_RE.findall(result.stderr)})
+
+
+def _save_image(image: Image.Image, path: str, **options):
+    # Écriture puis renommage : un autre worker ne lit jamais une image partielle
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    image.save(temp_path, format=options.pop("format"), **options)
+    os.replace(temp_path, path)
+
+
+def _scaled_size(width: int, height: int, target_width: Optional[int] = None,
+                 target_height: Optional[int] = None) -> tuple:
+    if target_width:
+        return target_width, max(2, round(target_width * height / width / 2) * 2)
+    return max(2, round(target_height * width / height / 2) * 2), target_height
+
+
+def build_index(video_path: str, force: bool = False, previews: bool = True) -> Optional[dict]:
+    """
+    Index de la vidéo (reconstruit s'il est absent ou obsolète)
+    previews=False : sans vignette ni filmstrip (uploads, absents de la bibliothèque de l'interface)
+    Retourne None si l'index ne peut pas être écrit (répertoire en lecture seule...)
+    """
+    if not force:
+        index = load_index(video_path)
+        if index:
+            return index
+
+    started = time.time()
+    index_dir = index_dir_for(video_path)
+    stat = os.stat(video_path)
+    try:
+        os.makedirs(index_dir, exist_ok=True)
+    except OSError as e:
+        print(f"⚠️ Index impossible pour {os.path.basename(video_path)}: {e}")
+        return None
+
+    infos = ffmpeg_parse_infos(video_path)
+    width, height = infos["video_size"]
+    duration = infos["duration"]
+    index = {
+        "version": INDEX_VERSION,
+        "source": os.path.basename(video_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "duration": duration,
+        "fps": infos["video_fps"],
+        "width": width,
+        "height": height,
+        "keyframes": extract_keyframes(video_path),
+        "posters": [],
+    }
+
+    # Frames source gardées : la frame 0 n'est décodée qu'une fois pour tous les posters et la vignette
+    decoder_pool = DecoderPool(max_readers=1, max_cache_bytes=64 * 1024 * 1024, cache_source_frames=True)
+    try:
+        # Posters assombris (30%) de la frame 0 : mêmes pixels que l'image fixe du rendu
+        for rows, cols in INDEX_GRID_SIZES:
+            cell_width, cell_height = OUTPUT_WIDTH // cols, OUTPUT_HEIGHT // rows
+            frame = decoder_pool.get_frame(SourceWindow(video_path, cell_width, cell_height), 0.0)
+            filename = poster_filename(cell_width, cell_height)
+            _save_image(Image.fromarray((frame * 0.3).astype('uint8')), os.path.join(index_dir, filename), format="PNG")
+            index["posters"].append(filename)
+
+        if not previews:
+            return _write_index(index_dir, index, started)
+
+        # Vignette pour l'interface
+        thumb_width, thumb_height = _scaled_size(width, height, target_width=INDEX_THUMBNAIL_WIDTH)
+        frame = decoder_pool.get_frame(SourceWindow(video_path, thumb_width, thumb_height), 0.0)
+        _save_image(Image.fromarray(frame), os.path.join(index_dir, "thumb.jpg"), format="JPEG", quality=80)
+        index["thumbnail"] = "thumb.jpg"
+
+        # Filmstrip : une vignette toutes les INDEX_FILMSTRIP_INTERVAL secondes, côte à côte
+        tile_width, tile_height = _scaled_size(width, height, target_height=INDEX_FILMSTRIP_HEIGHT)
+        count = max(1, min(INDEX_FILMSTRIP_MAX_FRAMES, int(duration // INDEX_FILMSTRIP_INTERVAL)))
+        interval = duration / count
+        window = SourceWindow(video_path, tile_width, tile_height)
+        tiles = [decoder_pool.get_frame(window, i * interval) for i in range(count)]
+        _save_image(Image.fromarray(np.concatenate(tiles, axis=1)), os.path.join(index_dir, "filmstrip.jpg"),
+                    format="JPEG", quality=70)
+        index["filmstrip"] = {
+            "file": "filmstrip.jpg",
+            "tile": [tile_width, tile_height],
+            "interval": interval,
+            "count": count,
+        }
+    finally:
+        decoder_pool.close()
+
+    return _write_index(index_dir, index, started)
+
+
+def _write_index(index_dir: str, index: dict, started: float) -> dict:
+    # index.json en dernier : sa présence signifie que l'index est complet
+    index_path = os.path.join(index_dir, INDEX_FILENAME)
+    temp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(temp_path, index_path)
+
+    print(f"🗂️ Index de {index['source']}: {len(index['keyframes'])} keyframes, "
+          f"{len(index['posters'])} posters ({time.time() - started:.2f}s)")
+    return index
+
+
+def index_library(clips_dir: str) -> dict:
+    """Indexe toutes les vidéos du répertoire (les index à jour sont conservés)"""
+    stats = {"indexed": 0, "up_to_date": 0, "failed": 0}
+    if not os.path.isdir(clips_dir):
+        return stats
+
+    for filename in sorted(os.listdir(clips_dir)):
+        if os.path.splitext(filename)[1].lower() not in VIDEO_EXTENSIONS:
+            continue
+        video_path = os.path.join(clips_dir, filename)
+        try:
+            if load_index(video_path):
+                stats["up_to_date"] += 1
+            elif build_index(video_path, force=True):
+                stats["indexed"] += 1
+            else:
+                stats["failed"] += 1
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"⚠️ Index impossible pour {filename}: {e}")
+    return stats
+
+
+def index_uploads(paths: list) -> int:
+    """Index léger des vidéos uploadées (sans vignette ni filmstrip) ; retourne le nombre indexé"""
+    indexed = 0
+    for video_path in paths:
+        try:
+            if build_index(video_path, previews=False):
+                indexed += 1
+        except Exception as e:
+            print(f"⚠️ Index impossible pour {os.path.basename(video_path)}: {e}")
+    return indexed
@@ -1,21 +1,73 @@
 #!/usr/bin/env python3
 """
 API de rendu vidéo pour VideoSequencer
+
+Le processus API reste léger (FastAPI + pydantic) : MoviePy et ffmpeg ne sont
+chargés que dans les workers de rendu, démarrés et préchauffés au boot.
 """
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from moviepy import VideoFileClip, ColorClip, CompositeVideoClip
+from composition import (
+    RenderRequest, BatchRenderRequest, PlanRequest, SegmentRequest,
+    apply_variant, composition_duration, find_video_path, instruments_outside_grid,
+)
+from config import (
+    CLIPS_DIR, INDEX_ON_BOOT, OUTPUT_DIR, TEMP_DIR, SEGMENTS_DIR, RENDER_CACHE_MB,
+    RENDER_CACHE_LEASE_MINUTES, RENDER_WORKERS,
+    ENCODE_PROFILE, ENCODE_PROFILES, OUTPUT_WIDTH, OUTPUT_HEIGHT,
+    LIVE_DIR, HLS_PLAYLIST, HLS_PROFILE, HLS_SEGMENT_SECONDS,
+    RENDER_NODES, SEGMENT_SECONDS, SEGMENT_RETRIES, SEGMENT_TIMEOUT, NODE_CONCURRENCY,
+    SEGMENT_STRAGGLER_TIMEOUT,
+)
+from render_cache import RenderCache, hash_bytes, hash_file, render_key
+from distributed import SegmentCoordinator
+from media_index import load_index
+from workers import RenderWorkers
 import os
-import tempfile
+import asyncio
 import json
-import subprocess
+import re
+import shutil
+import tempfile
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
+
+# Workers de rendu (processus séparés, préchauffés au démarrage)
+render_workers = RenderWorkers(RENDER_WORKERS)
+
+# Mode coordinateur : rendus découpés en segments et répartis sur RENDER_NODES
+coordinator = SegmentCoordinator(
+    RENDER_NODES, SEGMENTS_DIR, SEGMENT_SECONDS, SEGMENT_RETRIES, SEGMENT_TIMEOUT, NODE_CONCURRENCY,
+    SEGMENT_STRAGGLER_TIMEOUT
+) if RENDER_NODES else None
+
+async def start_workers():
+    await render_workers.start()
+    if INDEX_ON_BOOT and render_workers.ready:
+        # Indexation de la bibliothèque après le préchauffage (seuls les médias modifiés sont refaits)
+        await index_library()
 
-app = FastAPI(title="VideoSequencer Render Service")
+async def index_library() -> dict:
+    try:
+        stats = await render_workers.index_library(CLIPS_DIR)
+    except Exception as e:
+        print(f"⚠️ Indexation de la bibliothèque échouée: {e}")
+        raise
+    print(f"🗂️ Bibliothèque indexée: {stats}")
+    return stats
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Préchauffage en arrière-plan : /health répond immédiatement, /health/ready une fois prêt
+    warmup = asyncio.ensure_future(start_workers())
+    yield
+    warmup.cancel()
+    render_workers.shutdown()
+
+app = FastAPI(title="VideoSequencer Render Service", lifespan=lifespan)
 
 # CORS pour permettre les requêtes depuis l'app web
 app.add_middleware(
@@ -26,355 +78,457 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Modèles
-class GridSize(BaseModel):
-    rows: int
-    cols: int
-
-class Instrument(BaseModel):
-    id: str
-    name: str
-    gridPosition: int
-    offset: float = 0.0  # Offset de départ dans la vidéo (en secondes)
-    maxDuration: float = 0.0  # Durée maximale utilisable (en secondes, 0 = pas de limite)
-
-class Clip(BaseModel):
-    id: str
-    instrumentId: str
-    startTime: float
-    duration: float
-
-class RenderRequest(BaseModel):
-    bpm: int
-    gridSize: GridSize
-    instruments: List[Instrument]
-    clips: List[Clip]
-
-# Configuration
-# Chemins - utiliser des chemins relatifs pour exécution locale
-CLIPS_DIR = os.environ.get('CLIPS_DIR', "/app/clips")
-OUTPUT_DIR = os.environ.get('OUTPUT_DIR', "/app/output")
-TEMP_DIR = os.environ.get('TEMP_DIR', "/tmp/VideoSequencer_uploads")
-
-# Créer les répertoires seulement s'ils n'existent pas et qu'on a les permissions
-try:
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
-    os.makedirs(TEMP_DIR, exist_ok=True)
-except OSError as e:
-    print(f"⚠️ Impossible de créer les répertoires: {e}")
-    # Utiliser des chemins locaux si /app n'est pas accessible
-    if not os.path.exists(OUTPUT_DIR):
-        OUTPUT_DIR = "./output"
-        os.makedirs(OUTPUT_DIR, exist_ok=True)
-    if not os.path.exists(CLIPS_DIR):
-        CLIPS_DIR = "../clips"
-
-def beats_to_seconds(beats: float, bpm: int) -> float:
-    return (beats / bpm) * 60
-
-def precise_cut_video(input_path: str, start_time: float, duration: float, output_path: str) -> bool:
-    """
-    Découpe une vidéo avec précision frame-parfaite en utilisant ffmpeg directement
-    Retourne True si succès, False sinon
-    """
-    try:
-        # Utiliser ffmpeg pour un découpage précis
-        # -ss avant -i pour seek rapide, -t pour la durée
-        # -c copy ne fonctionne pas pour découpage précis, on doit réencoder
-        cmd = [
-            'ffmpeg', '-y',
-            '-ss', str(start_time),  # Seek au timestamp exact
-            '-i', input_path,
-            '-t', str(duration),  # Durée exacte
-            '-c:v', 'libx264',  # Réencodage nécessaire pour précision frame
-            '-preset', 'ultrafast',  # Rapide pour le rendu
-            '-crf', '18',  # Qualité élevée
-            '-c:a', 'aac',
-            '-b:a', '192k',
-            output_path
-        ]
-
-        # Afficher la commande complète pour debug
-        cmd_str = ' '.join(cmd)
-        print(f"     🔧 Commande ffmpeg: {cmd_str}")
-
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            print(f"     ❌ Erreur ffmpeg stderr: {result.stderr}")
-
-        return result.returncode == 0
-    except Exception as e:
-        print(f"❌ Erreur ffmpeg: {e}")
-        return False
+# Cache des rendus terminés et rendus en cours (clé canonique -> tâche)
+# Bail : un rendu servi (réponse en cours, URL /output transmise, HLS en lecture) n'est pas évincé
+render_cache = RenderCache(OUTPUT_DIR, RENDER_CACHE_MB * 1024 * 1024, RENDER_CACHE_LEASE_MINUTES * 60)
+inflight_renders: Dict[str, asyncio.Future] = {}
+# Rendus HLS en échec (clé -> erreur), pour /live/{render_id}
+live_failures: Dict[str, str] = {}
 
 @app.get("/")
 def root():
     return {"status": "ok", "service": "VideoSequencer Render API"}
 
+def output_profile(profile: dict, width: int, height: int) -> dict:
+    """Profil de sortie complet (encodage + taille), inclus dans la clé du cache de rendu"""
+    return {"encode": profile, "size": [width, height]}
+
+def output_path_for(key: str) -> str:
+    output_filename = f"render_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{key[:8]}.mp4"
+    return os.path.join(OUTPUT_DIR, output_filename)
+
+async def save_uploads(videos: Optional[List[UploadFile]]):
+    """Sauvegarde les vidéos uploadées ; retourne (nom -> chemin, nom -> sha256)"""
+    uploaded_videos = {}
+    uploaded_hashes = {}
+    if videos:
+        print(f"📤 Réception de {len(videos)} vidéos uploadées...")
+        for video_file in videos:
+            # Le nom du fichier doit correspondre au nom de l'instrument
+            filename = os.path.basename(video_file.filename)
+            content = await video_file.read()
+            content_hash = hash_bytes(content)
+            # Stockage par contenu (TEMP_DIR/<sha256>/<fichier>) : deux uploads homonymes mais
+            # différents ne s'écrasent jamais pendant un rendu, et un fichier déjà présent
+            # n'est pas réécrit (mtime, et donc son index, restent valides)
+            upload_dir = os.path.join(TEMP_DIR, content_hash)
+            temp_path = os.path.join(upload_dir, filename)
+            if not os.path.isfile(temp_path):
+                os.makedirs(upload_dir, exist_ok=True)
+                with tempfile.NamedTemporaryFile(dir=upload_dir, suffix=".tmp", delete=False) as f:
+                    f.write(content)
+                os.replace(f.name, temp_path)
+
+            # Extraire le nom sans extension
+            name = os.path.splitext(filename)[0]
+            uploaded_videos[name] = temp_path
+            uploaded_hashes[name] = content_hash
+            print(f"  ✓ Sauvegardé: {name} -> {temp_path}")
+    return uploaded_videos, uploaded_hashes
+
+async def source_media_hashes(request: RenderRequest, uploaded_videos: Dict[str, str], uploaded_hashes: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """Contenu des médias sources de chaque instrument (partie de la clé du cache de rendu)"""
+    media_hashes = {}
+    for inst in request.instruments:
+        if inst.name in uploaded_hashes:
+            media_hashes[inst.name] = uploaded_hashes[inst.name]
+        else:
+            video_path = find_video_path(inst.name, uploaded_videos)
+            media_hashes[inst.name] = await asyncio.to_thread(hash_file, video_path) if video_path else None
+    return media_hashes
+
+def index_uploads(uploaded_videos: Dict[str, str]):
+    """
+    Indexation des uploads pas encore indexés, en arrière-plan (sans vignette ni filmstrip)
+    Appelée après la soumission du rendu : celui-ci obtient un worker en premier et n'attend
+    jamais l'index, qui ne sert qu'aux rendus suivants des mêmes fichiers
+    """
+    paths = [path for path in uploaded_videos.values() if not load_index(path)]
+    if paths and render_workers.ready:
+        task = asyncio.ensure_future(render_workers.index_uploads(paths))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+def track_inflight(key: str, task: asyncio.Future):
+    inflight_renders[key] = task
+    task.add_done_callback(lambda _: inflight_renders.pop(key, None))
+
+async def render_and_store(key: str, request: RenderRequest, uploaded_videos: Dict[str, str], output_path: str) -> str:
+    if coordinator:
+        # Mode coordinateur : les uploads sont déjà dans TEMP_DIR, partagé avec les nœuds
+        uploads = {name: os.path.relpath(path, TEMP_DIR) for name, path in uploaded_videos.items()}
+        await coordinator.render(key, request.model_dump(), uploads, output_path, "default", ENCODE_PROFILE["fps"])
+    else:
+        await render_workers.render(request.model_dump(), uploaded_videos, output_path)
+    render_cache.store(key, output_path)
+    return output_path
+
+async def render_batch_and_store(jobs: Dict[str, dict], uploaded_videos: Dict[str, str]) -> Dict[str, str]:
+    output_paths = await render_workers.render_batch(list(jobs.values()), uploaded_videos)
+    for key, output_path in zip(jobs, output_paths):
+        render_cache.store(key, output_path)
+    return dict(zip(jobs, output_paths))
+
+async def batch_output(batch_task: asyncio.Future, key: str) -> str:
+    return (await batch_task)[key]
+
+async def render_live_and_store(key: str, request: RenderRequest, uploaded_videos: Dict[str, str]) -> str:
+    """Rendu HLS : playlist et segments publiés dans LIVE_DIR/<clé> au fil de l'encodage"""
+    live_dir = os.path.join(LIVE_DIR, key)
+    # Repartir d'un répertoire vide (restes d'une tentative précédente en échec)
+    shutil.rmtree(live_dir, ignore_errors=True)
+    os.makedirs(live_dir)
+    live_failures.pop(key, None)
+    try:
+        await render_workers.render(
+            request.model_dump(), uploaded_videos, os.path.join(live_dir, HLS_PLAYLIST),
+            profile=HLS_PROFILE, progressive=True
+        )
+    except Exception as e:
+        live_failures[key] = str(e)
+        print(f"❌ Erreur de rendu HLS: {str(e)}")
+        raise
+    render_cache.store(key, live_dir)
+    print(f"✅ Rendu HLS terminé: {key[:8]}")
+    return live_dir
+
+def live_response(key: str, cache_status: str) -> dict:
+    return {
+        "renderId": key,
+        "playlist": f"/live/{key}/{HLS_PLAYLIST}",
+        "status": f"/live/{key}",
+        "cache": cache_status,
+    }
+
+def render_response(output_path: str, cache_status: str) -> FileResponse:
+    return FileResponse(
+        output_path,
+        media_type="video/mp4",
+        filename=os.path.basename(output_path),
+        headers={"X-Render-Cache": cache_status}
+    )
+
 @app.post("/render")
 async def render_video(
     data: str = Form(...),
-    videos: Optional[List[UploadFile]] = File(None)
+    videos: Optional[List[UploadFile]] = File(None),
+    output: str = Form("mp4")
 ):
     """
     Génère une vidéo à partir de la composition
     Accepte aussi des vidéos uploadées en plus de celles dans ./clips/
+    Une composition déjà rendue est servie depuis le cache, et une requête identique
+    à un rendu en cours se rattache à celui-ci au lieu d'en lancer un second
+    output=hls : répond immédiatement avec l'URL d'une playlist HLS alimentée
+    pendant l'encodage (la lecture commence dès le premier segment)
     """
     try:
+        if output not in ("mp4", "hls"):
+            raise HTTPException(status_code=400, detail=f"Format de sortie inconnu: {output}")
+
         # Parser les données JSON
         request = RenderRequest(**json.loads(data))
 
         # Sauvegarder les vidéos uploadées temporairement
-        uploaded_videos = {}
-        if videos:
-            print(f"📤 Réception de {len(videos)} vidéos uploadées...")
-            for video_file in videos:
-                # Le nom du fichier doit correspondre au nom de l'instrument
-                temp_path = os.path.join(TEMP_DIR, video_file.filename)
-                with open(temp_path, 'wb') as f:
-                    content = await video_file.read()
-                    f.write(content)
-
-                # Extraire le nom sans extension
-                name = os.path.splitext(video_file.filename)[0]
-                uploaded_videos[name] = temp_path
-                print(f"  ✓ Sauvegardé: {name} -> {temp_path}")
-        # Calculer la durée totale
-        last_clip_end = max(
-            (clip.startTime + clip.duration for clip in request.clips),
-            default=0
-        )
-        total_duration = beats_to_seconds(last_clip_end, request.bpm)
+        uploaded_videos, uploaded_hashes = await save_uploads(videos)
 
-        if total_duration == 0:
+        # Vérifier qu'il y a quelque chose à rendre
+        if composition_duration(request) == 0:
             raise HTTPException(status_code=400, detail="Aucun clip à rendre")
 
-        # Configuration de la grille
-        grid_cols = request.gridSize.cols
-        grid_rows = request.gridSize.rows
-        cell_width = 1920 // grid_cols
-        cell_height = 1080 // grid_rows
-
-        print(f"🎬 Rendu VideoSequencer - Durée: {total_duration:.2f}s, Grille: {grid_cols}x{grid_rows}")
-
-        # Fond noir
-        base = ColorClip(size=(1920, 1080), color=(0, 0, 0), duration=total_duration)
-
-        # Créer les frames statiques pour chaque instrument
-        print("Création des images fixes...")
-        static_frames = []
-
-        for inst in request.instruments:
-            # Chercher d'abord dans les uploads, puis dans ./clips/
-            video_path = uploaded_videos.get(inst.name)
-
-            if not video_path:
-                # Chercher avec différentes extensions
-                for ext in ['.mp4', '.mov', '.avi', '.mkv', '.webm']:
-                    potential_path = os.path.join(CLIPS_DIR, f"{inst.name}{ext}")
-                    if os.path.exists(potential_path):
-                        video_path = potential_path
-                        break
-
-            if not video_path or not os.path.exists(video_path):
-                print(f"⚠️  Vidéo non trouvée: {inst.name}")
-                continue
-
-            row = inst.gridPosition // grid_cols
-            col = inst.gridPosition % grid_cols
-            x = col * cell_width
-            y = row * cell_height
-
-            # Utiliser l'offset de l'instrument
-            offset = inst.offset
-
-            # Extraire la frame à l'offset spécifié
-            video = VideoFileClip(video_path)
-            static_frame = video.to_ImageClip(offset)
-            static_frame = static_frame.resized((cell_width, cell_height))
-            # Assombrir l'image statique (30% de luminosité)
-            static_frame = static_frame.image_transform(lambda image: (image * 0.3).astype('uint8'))
-            static_frame = static_frame.with_duration(total_duration)
-            static_frame = static_frame.with_position((x, y))
-            static_frames.append(static_frame)
-            video.close()
-
-        # Créer les clips animés
-        print(f"Création de {len(request.clips)} clips animés...")
-        animated_clips = []
-
-        # Cache pour éviter de découper et charger plusieurs fois le même clip
-        # Clé: (instrument_name, offset, duration) -> chemin du fichier découpé
-        cut_clips_cache = {}
-        # Cache des clips MoviePy chargés (pour éviter de charger 332 fois le même fichier)
-        # Clé: chemin du fichier -> VideoFileClip (non redimensionné, non positionné)
-        loaded_clips_cache = {}
-
-        for clip in request.clips:
-            # Trouver l'instrument correspondant
-            inst = next((i for i in request.instruments if i.id == clip.instrumentId), None)
-            if not inst:
-                continue
-
-            # Chercher d'abord dans les uploads, puis dans ./clips/
-            video_path = uploaded_videos.get(inst.name)
-
-            if not video_path:
-                # Chercher avec différentes extensions
-                print(f"     🔍 Recherche vidéo pour: '{inst.name}'")
-                for ext in ['.mp4', '.mov', '.avi', '.mkv', '.webm']:
-                    potential_path = os.path.join(CLIPS_DIR, f"{inst.name}{ext}")
-                    print(f"        Essai: {potential_path}")
-                    if os.path.exists(potential_path):
-                        video_path = potential_path
-                        print(f"        ✅ Trouvé!")
-                        break
-                    else:
-                        print(f"        ❌ N'existe pas")
-
-            if not video_path or not os.path.exists(video_path):
-                print(f"⚠️  Vidéo non trouvée pour instrument: {inst.name}")
-                print(f"     Fichiers disponibles dans {CLIPS_DIR}:")
-                try:
-                    files = os.listdir(CLIPS_DIR)
-                    for f in sorted(files):
-                        print(f"       - {f}")
-                except Exception as e:
-                    print(f"     Erreur listage: {e}")
-                continue
-
-            start_sec = beats_to_seconds(clip.startTime, request.bpm)
-            offset = inst.offset
-            max_duration = inst.maxDuration
-
-            row = inst.gridPosition // grid_cols
-            col = inst.gridPosition % grid_cols
-            x = col * cell_width
-            y = row * cell_height
-
-            # Créer le clip avec offset et maxDuration (indépendant de la durée en beats)
-            video = VideoFileClip(video_path)
-            available_duration = video.duration - offset
-
-            # Utiliser la portion définie par offset et maxDuration
-            if max_duration > 0:
-                # Limiter par maxDuration
-                clip_duration = min(max_duration, available_duration)
-            else:
-                # Utiliser toute la vidéo disponible après l'offset
-                clip_duration = available_duration
-
-            # Debug logging pour diagnostic
-            print(f"  📊 Clip {clip.id} (instrument: {inst.name}):")
-            print(f"     - startTime (beats): {clip.startTime}")
-            print(f"     - start_sec (calculé): {start_sec:.3f}s")
-            print(f"     - offset: {offset:.3f}s")
-            print(f"     - max_duration: {max_duration:.3f}s")
-            print(f"     - video.duration: {video.duration:.3f}s")
-            print(f"     - available_duration: {available_duration:.3f}s")
-            print(f"     - clip_duration (final): {clip_duration:.3f}s")
-            print(f"     - position grid: ({row}, {col}) → coords: ({x}, {y})")
-
-            # Vérifier si on a déjà découpé ce même clip (même instrument + offset + durée)
-            cache_key = (inst.name, offset, clip_duration)
-            temp_cut_path = cut_clips_cache.get(cache_key)
-
-            if temp_cut_path:
-                print(f"     - ♻️ Réutilisation du clip en cache")
-            else:
-                # Découper la vidéo avec ffmpeg pour précision frame-parfaite
-                print(f"     - Découpage précis avec ffmpeg: de {offset:.3f}s, durée {clip_duration:.3f}s")
-
-                # Créer un fichier temporaire pour le clip découpé
-                # Utiliser un nom basé sur le cache_key pour éviter les collisions
-                temp_cut_path = os.path.join(TEMP_DIR, f"cut_{inst.name}_{offset}_{clip_duration}.mp4")
+        # Clé canonique : composition + contenu des médias sources + profil de sortie
+        media_hashes = await source_media_hashes(request, uploaded_videos, uploaded_hashes)
+        profile = HLS_PROFILE if output == "hls" else ENCODE_PROFILE
+        key = render_key(
+            request.model_dump(), media_hashes,
+            output_profile(profile, OUTPUT_WIDTH, OUTPUT_HEIGHT)
+        )
 
-                # Découper avec ffmpeg (précision frame-parfaite)
-                success = precise_cut_video(video_path, offset, clip_duration, temp_cut_path)
+        if output == "hls":
+            if render_cache.lookup(key):
+                return live_response(key, "hit")
+            if key in inflight_renders:
+                return live_response(key, "shared")
+            task = asyncio.ensure_future(render_live_and_store(key, request, uploaded_videos))
+            # L'erreur est conservée dans live_failures : marquer l'exception comme lue
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            track_inflight(key, task)
+            index_uploads(uploaded_videos)
+            return live_response(key, "miss")
+
+        cached_path = render_cache.lookup(key)
+        if cached_path:
+            print(f"♻️ Rendu servi depuis le cache: {os.path.basename(cached_path)}")
+            return render_response(cached_path, "hit")
+
+        task = inflight_renders.get(key)
+        cache_status = "shared"
+        if task is None:
+            cache_status = "miss"
+            task = asyncio.ensure_future(
+                render_and_store(key, request, uploaded_videos, output_path_for(key))
+            )
+            track_inflight(key, task)
+            index_uploads(uploaded_videos)
+        else:
+            print(f"🔗 Rendu identique déjà en cours, rattachement ({key[:8]})")
+
+        # shield : la déconnexion d'un client ne doit pas annuler un rendu partagé
+        output_path = await asyncio.shield(task)
 
-                if not success:
-                    print(f"⚠️  Échec découpage ffmpeg pour clip {clip.id}")
-                    continue
+        # Retourner le fichier
+        return render_response(output_path, cache_status)
 
-                # Mettre en cache
-                cut_clips_cache[cache_key] = temp_cut_path
-                print(f"     - ✅ Clip découpé et mis en cache")
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Erreur de rendu: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-            # Charger le clip pré-découpé dans MoviePy (avec cache)
-            if temp_cut_path in loaded_clips_cache:
-                base_clip = loaded_clips_cache[temp_cut_path]
-                print(f"     - ♻️ Clip MoviePy en cache")
+@app.post("/render/batch")
+async def render_batch(
+    data: str = Form(...),
+    videos: Optional[List[UploadFile]] = File(None)
+):
+    """
+    Génère plusieurs variantes (bpm, grille, taille de sortie, profil) d'une même composition
+    Les variantes à rendre sont planifiées ensemble dans un seul job : uploads, découpes,
+    sondes et décodage des sources ne sont faits qu'une fois
+    Retourne la liste des fichiers produits, téléchargeables via /output/{filename}
+    """
+    try:
+        batch = BatchRenderRequest(**json.loads(data))
+        if not batch.variants:
+            raise HTTPException(status_code=400, detail="Aucune variante à rendre")
+
+        uploaded_videos, uploaded_hashes = await save_uploads(videos)
+        # Les instruments sont communs à toutes les variantes : un seul hachage des sources
+        media_hashes = await source_media_hashes(batch.composition, uploaded_videos, uploaded_hashes)
+
+        # Planifier : cache, rendus en cours, ou nouveau rendu dans le job groupé
+        planned = []
+        jobs: Dict[str, dict] = {}
+        tasks: Dict[str, asyncio.Future] = {}
+        for index, variant in enumerate(batch.variants):
+            profile = ENCODE_PROFILES.get(variant.profile)
+            if profile is None:
+                raise HTTPException(status_code=400, detail=f"Profil inconnu: {variant.profile}")
+            if variant.width <= 0 or variant.height <= 0 or variant.width % 2 or variant.height % 2:
+                raise HTTPException(status_code=400, detail=f"Taille de sortie invalide: {variant.width}x{variant.height}")
+
+            request = apply_variant(batch.composition, variant)
+            if composition_duration(request) == 0:
+                raise HTTPException(status_code=400, detail="Aucun clip à rendre")
+            outside = instruments_outside_grid(request)
+            if outside:
+                grid = f"{request.gridSize.rows}x{request.gridSize.cols}"
+                names = ", ".join(f"{inst.name} (position {inst.gridPosition})" for inst in outside)
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Variante {variant.name or index}: instruments hors de la grille {grid}: {names}"
+                )
+
+            key = render_key(
+                request.model_dump(), media_hashes,
+                output_profile(profile, variant.width, variant.height)
+            )
+            name = variant.name or str(index)
+
+            cached_path = render_cache.lookup(key)
+            if cached_path:
+                planned.append((name, key, "hit", cached_path))
+            elif key in inflight_renders or key in jobs:
+                if key in inflight_renders:
+                    tasks[key] = inflight_renders[key]
+                planned.append((name, key, "shared", None))
             else:
-                base_clip = VideoFileClip(temp_cut_path)
-                loaded_clips_cache[temp_cut_path] = base_clip
-                print(f"     - Clip chargé dans MoviePy, durée: {base_clip.duration:.3f}s")
-
-            # Créer une instance positionnée et redimensionnée pour ce clip spécifique
-            # Utiliser copy() pour créer une instance indépendante
-            video_cut = base_clip.copy()
-            video_cut = video_cut.resized((cell_width, cell_height))
-            video_cut = video_cut.with_start(start_sec)
-            video_cut = video_cut.with_position((x, y))
-
-            print(f"     - Clip ajouté à la position {start_sec:.3f}s dans la composition")
-            animated_clips.append(video_cut)
-
-        # Statistiques du cache
-        print(f"\n📊 Statistiques du cache:")
-        print(f"   - Clips traités: {len(request.clips)}")
-        print(f"   - Clips uniques découpés: {len(cut_clips_cache)}")
-        print(f"   - Réutilisations: {len(request.clips) - len(cut_clips_cache)}")
-        print(f"   - Gain: {((len(request.clips) - len(cut_clips_cache)) / len(request.clips) * 100):.1f}%\n")
-
-        # Composer
-        print("Composition finale...")
-        final = CompositeVideoClip(
-            [base] + static_frames + animated_clips,
-            size=(1920, 1080)
-        )
-
-        # Générer le nom de fichier de sortie
-        output_filename = f"render_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
-        output_path = os.path.join(OUTPUT_DIR, output_filename)
-
-        # Rendu
-        print(f"Rendu vers: {output_path}")
-        # Utiliser des paramètres ffmpeg pour forcer la précision du découpage
-        # -avoid_negative_ts make_zero: évite les timestamps négatifs
-        # -copyts: préserve les timestamps originaux
-        final.write_videofile(
-            output_path,
-            fps=30,
-            codec='libx264',
-            audio_codec='aac',
-            bitrate='5000k',
-            preset='medium',
-            ffmpeg_params=['-avoid_negative_ts', 'make_zero'],
-            logger=None  # Désactiver les logs verbeux
-        )
-
-        # Nettoyer
-        final.close()
-        for clip in animated_clips:
-            clip.close()
-        for frame in static_frames:
-            frame.close()
-        base.close()
+                jobs[key] = {
+                    "request": request.model_dump(),
+                    "output_path": output_path_for(key),
+                    "width": variant.width,
+                    "height": variant.height,
+                    "profile": profile,
+                }
+                planned.append((name, key, "miss", None))
+
+        if jobs:
+            print(f"📦 {len(jobs)}/{len(batch.variants)} variantes à rendre")
+            batch_task = asyncio.ensure_future(render_batch_and_store(jobs, uploaded_videos))
+            for key in jobs:
+                tasks[key] = asyncio.ensure_future(batch_output(batch_task, key))
+                track_inflight(key, tasks[key])
+            index_uploads(uploaded_videos)
+
+        outputs = []
+        for name, key, cache_status, output_path in planned:
+            if output_path is None:
+                # shield : la déconnexion d'un client ne doit pas annuler un rendu partagé
+                output_path = await asyncio.shield(tasks[key])
+            filename = os.path.basename(output_path)
+            outputs.append({
+                "variant": name,
+                "filename": filename,
+                "url": f"/output/{filename}",
+                "cache": cache_status,
+            })
+
+        return {"outputs": outputs}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Erreur de rendu groupé: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        print(f"✅ Rendu terminé: {output_filename}")
+def shared_uploads(uploads: Dict[str, str]) -> Dict[str, str]:
+    """Chemins des uploads du coordinateur dans TEMP_DIR (partagé) : <sha256>/<fichier>, sans sortir du répertoire"""
+    paths = {}
+    for name, relative_path in uploads.items():
+        content_hash, _, filename = relative_path.partition('/')
+        if not re.fullmatch(r"[0-9a-f]{64}", content_hash) or not filename or filename != os.path.basename(filename):
+            raise HTTPException(status_code=400, detail=f"Upload invalide: {relative_path}")
+        paths[name] = os.path.join(TEMP_DIR, content_hash, filename)
+    return paths
+
+@app.post("/render/plan")
+async def render_plan(plan: PlanRequest):
+    """Nœud de rendu : durée réelle de la composition, pour le découpage en segments"""
+    uploaded_videos = shared_uploads(plan.uploads)
+    try:
+        duration = await render_workers.composition_extent(plan.request.model_dump(), uploaded_videos)
+        return {"duration": duration}
+    except Exception as e:
+        print(f"❌ Erreur de planification: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Retourner le fichier
-        return FileResponse(
-            output_path,
-            media_type="video/mp4",
-            filename=output_filename
-        )
+@app.post("/render/segment")
+async def render_segment(segment: SegmentRequest):
+    """
+    Nœud de rendu : encode dans SEGMENTS_DIR (partagé) le segment vidéo [start, end),
+    ou la piste audio complète de la composition (track=audio), multiplexée par le coordinateur
+    """
+    profile = ENCODE_PROFILES.get(segment.profile)
+    if profile is None:
+        raise HTTPException(status_code=400, detail=f"Profil inconnu: {segment.profile}")
+    if segment.track not in ("video", "audio"):
+        raise HTTPException(status_code=400, detail=f"Piste inconnue: {segment.track}")
+    uploaded_videos = shared_uploads(segment.uploads)
+    try:
+        output_path = os.path.join(SEGMENTS_DIR, os.path.basename(segment.filename))
+        if segment.track == "audio":
+            await render_workers.render_audio(
+                segment.request.model_dump(), uploaded_videos, output_path, segment.end, profile
+            )
+        else:
+            await render_workers.render(
+                segment.request.model_dump(), uploaded_videos, output_path,
+                profile=profile, start=segment.start, end=segment.end, audio=False
+            )
+        return {"filename": os.path.basename(output_path)}
+    except Exception as e:
+        print(f"❌ Erreur de rendu du segment: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
+LIVE_MEDIA_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".m4s": "video/iso.segment",
+    ".mp4": "video/mp4",
+}
+
+def live_dir_for(render_id: str) -> str:
+    if not re.fullmatch(r"[0-9a-f]{64}", render_id):
+        raise HTTPException(status_code=404, detail="Rendu introuvable")
+    return os.path.join(LIVE_DIR, render_id)
+
+@app.get("/live/{render_id}")
+def live_status(render_id: str):
+    """État d'un rendu HLS : rendering, complete ou failed"""
+    live_dir = live_dir_for(render_id)
+    if render_id in inflight_renders:
+        state = "rendering"
+    elif render_id in live_failures:
+        state = "failed"
+    elif render_cache.lookup(render_id):
+        state = "complete"
+    else:
+        raise HTTPException(status_code=404, detail="Rendu introuvable")
+
+    segments = len([f for f in os.listdir(live_dir) if f.endswith('.m4s')]) if os.path.isdir(live_dir) else 0
+    return {
+        "renderId": render_id,
+        "state": state,
+        "segments": segments,
+        "playlist": f"/live/{render_id}/{HLS_PLAYLIST}",
+        "error": live_failures.get(render_id),
+    }
+
+@app.get("/live/{render_id}/{filename}")
+def live_file(render_id: str, filename: str):
+    """Playlist HLS (relue par le lecteur pendant le rendu), segment d'initialisation et segments"""
+    filename = os.path.basename(filename)
+    path = os.path.join(live_dir_for(render_id), filename)
+    extension = os.path.splitext(filename)[1]
+    if extension not in LIVE_MEDIA_TYPES:
+        raise HTTPException(status_code=404, detail="Fichier introuvable")
+
+    if extension == ".m3u8":
+        headers = {"Cache-Control": "no-cache"}
+        if not os.path.isfile(path) and render_id in inflight_renders:
+            # Encodage pas encore commencé (découpes, audio) : playlist vide, le lecteur réessaie
+            placeholder = (
+                "#EXTM3U\n#EXT-X-VERSION:7\n"
+                f"#EXT-X-TARGETDURATION:{HLS_SEGMENT_SECONDS}\n#EXT-X-PLAYLIST-TYPE:EVENT\n"
+            )
+            return Response(placeholder, media_type=LIVE_MEDIA_TYPES[extension], headers=headers)
+    else:
+        headers = {}
+
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Fichier introuvable")
+    # Lecture en cours : renouveler le bail du rendu
+    render_cache.touch(os.path.relpath(os.path.dirname(path), OUTPUT_DIR))
+    return FileResponse(path, media_type=LIVE_MEDIA_TYPES[extension], headers=headers)
+
+@app.get("/output/{filename}")
+def get_output(filename: str):
+    """Télécharge un rendu produit par /render/batch"""
+    output_path = os.path.join(OUTPUT_DIR, os.path.basename(filename))
+    if not filename.endswith('.mp4') or not os.path.isfile(output_path):
+        raise HTTPException(status_code=404, detail="Rendu introuvable")
+    render_cache.touch(os.path.basename(output_path))
+    return FileResponse(output_path, media_type="video/mp4", filename=os.path.basename(output_path))
+
+@app.post("/index")
+async def reindex():
+    """Indexe les vidéos de ./clips/ (keyframes, posters, vignettes) ; les index à jour sont conservés"""
+    if not render_workers.ready:
+        raise HTTPException(status_code=503, detail="Workers de rendu non prêts")
+    try:
+        return await index_library()
     except Exception as e:
-        print(f"❌ Erreur de rendu: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/media/{filename}")
+def media_info(filename: str):
+    """Métadonnées indexées d'une vidéo de ./clips/ (durée, fps, taille, keyframes, filmstrip)"""
+    index = load_index(os.path.join(CLIPS_DIR, os.path.basename(filename)))
+    if not index:
+        raise HTTPException(status_code=404, detail="Média non indexé")
+    return index
+
 @app.get("/health")
 def health():
-    return {"status": "healthy"}
+    """Liveness : le processus API répond, que les workers soient prêts ou non"""
+    return {
+        "status": "healthy",
+        "mode": "coordinator" if coordinator else "standalone",
+        "nodes": RENDER_NODES,
+        **render_workers.health()
+    }
+
+@app.get("/health/ready")
+def ready():
+    """Readiness : 503 tant que les workers de rendu ne sont pas préchauffés"""
+    health = render_workers.health()
+    if not health["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", **health})
+    return {"status": "ready", **health}
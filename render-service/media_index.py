@@ -0,0 +1,51 @@
+"""
+Index des médias VideoSequencer (lecture)
+
+Chaque vidéo possède un répertoire .index/<fichier>/ à côté d'elle :
+index.json (durée, fps, taille, table des keyframes), posters assombris aux
+tailles de cellule courantes, vignette et filmstrip basse résolution.
+Module léger (bibliothèque standard uniquement) : utilisé par l'API comme par
+les workers. La construction de l'index est dans indexer.py.
+"""
+
+import json
+import os
+from typing import Optional
+
+from config import INDEX_DIRNAME
+
+INDEX_VERSION = 1
+INDEX_FILENAME = "index.json"
+
+
+def index_dir_for(video_path: str) -> str:
+    return os.path.join(os.path.dirname(video_path), INDEX_DIRNAME, os.path.basename(video_path))
+
+
+def poster_filename(width: int, height: int) -> str:
+    return f"poster_{width}x{height}.png"
+
+
+def load_index(video_path: str) -> Optional[dict]:
+    """Index de la vidéo s'il existe et correspond encore au fichier (taille + mtime), sinon None"""
+    try:
+        with open(os.path.join(index_dir_for(video_path), INDEX_FILENAME)) as f:
+            index = json.load(f)
+        stat = os.stat(video_path)
+    except (OSError, ValueError):
+        return None
+
+    if (index.get("version") != INDEX_VERSION
+            or index.get("size") != stat.st_size
+            or index.get("mtime_ns") != stat.st_mtime_ns):
+        return None
+    return index
+
+
+def poster_path(video_path: str, index: dict, width: int, height: int) -> Optional[str]:
+    """Poster assombri pré-calculé (frame 0) pour cette taille de cellule, s'il existe"""
+    filename = poster_filename(width, height)
+    if filename not in index.get("posters", []):
+        return None
+    path = os.path.join(index_dir_for(video_path), filename)
+    return path if os.path.exists(path) else None
@@ -0,0 +1,169 @@
+"""
+Cache des rendus VideoSequencer
+
+Associe une clé canonique (composition + médias sources + profil d'encodage)
+au fichier rendu dans OUTPUT_DIR (ou au répertoire d'un rendu HLS). L'index est
+persisté à côté des rendus, et les entrées les moins récemment utilisées sont
+supprimées quand le budget disque est dépassé, sauf pendant le bail qui suit leur
+dernier accès (rendu en téléchargement, URL transmise, HLS en lecture).
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+
+INDEX_FILENAME = "render_cache.json"
+
+# Empreintes des médias déjà hachés : (chemin, taille, mtime) -> sha256
+_media_hash_cache: Dict[tuple, str] = {}
+_media_hash_lock = threading.Lock()
+
+
+def hash_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """sha256 du contenu d'un fichier, mémorisé tant que taille et mtime ne changent pas"""
+    stat = os.stat(path)
+    memo_key = (path, stat.st_size, stat.st_mtime_ns)
+    with _media_hash_lock:
+        digest = _media_hash_cache.get(memo_key)
+    if digest:
+        return digest
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _media_hash_lock:
+        _media_hash_cache[memo_key] = digest
+    return digest
+
+
+def disk_usage(path: str) -> int:
+    """Taille d'un fichier, ou de tout le contenu d'un répertoire"""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+
+def render_key(request: dict, media_hashes: Dict[str, str], profile: dict) -> str:
+    """Clé canonique d'un rendu : JSON trié, sans espaces, haché en sha256"""
+    payload = {
+        "request": request,
+        "media": media_hashes,
+        "profile": profile,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """
+    Index clé -> fichier rendu, avec éviction LRU sous budget disque
+
+    Seuls les fichiers suivis par le cache comptent dans le budget et peuvent
+    être supprimés : les autres fichiers de OUTPUT_DIR ne sont jamais touchés.
+    Une entrée consultée depuis moins de lease_seconds n'est jamais évincée, quitte
+    à dépasser le budget le temps du bail.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, lease_seconds: float = 0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lease_seconds = lease_seconds
+        self.index_path = os.path.join(directory, INDEX_FILENAME)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = self._load()
+
+    def _load(self) -> Dict[str, dict]:
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        temp_path = self.index_path + ".tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(self._entries, f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            print(f"⚠️ Impossible d'écrire l'index du cache de rendu: {e}")
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Chemin du rendu en cache, ou None (les entrées dont le fichier a disparu sont oubliées)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+
+            path = os.path.join(self.directory, entry["filename"])
+            if not os.path.exists(path):
+                del self._entries[key]
+                self._save()
+                return None
+
+            entry["last_access"] = time.time()
+            self._save()
+            return path
+
+    def touch(self, filename: str) -> bool:
+        """Renouvelle le bail de l'entrée servie sous ce nom (relatif au répertoire du cache)"""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry["filename"] == filename:
+                    entry["last_access"] = time.time()
+                    self._save()
+                    return True
+            return False
+
+    def store(self, key: str, path: str):
+        """Enregistre un rendu terminé puis applique le budget disque"""
+        with self._lock:
+            self._entries[key] = {
+                "filename": os.path.relpath(path, self.directory),
+                "size": disk_usage(path),
+                "last_access": time.time(),
+            }
+            self._evict(keep=key)
+            self._save()
+
+    def _evict(self, keep: str):
+        total = sum(entry["size"] for entry in self._entries.values())
+        by_age = sorted(self._entries.items(), key=lambda item: item[1]["last_access"])
+        leased_since = time.time() - self.lease_seconds
+        for key, entry in by_age:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            if entry["last_access"] > leased_since:
+                # Les suivantes sont plus récentes encore : toutes sous bail
+                break
+            path = os.path.join(self.directory, entry["filename"])
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"⚠️ Impossible de supprimer {entry['filename']}: {e}")
+                continue
+            total -= entry["size"]
+            del self._entries[key]
+            print(f"🗑️ Rendu évincé du cache: {entry['filename']}")
@@ -0,0 +1,670 @@
+"""
+Moteur de rendu VideoSequencer (exécuté dans les workers de rendu)
+
+Toutes les dépendances lourdes (MoviePy, NumPy, imageio, recherche du binaire
+ffmpeg) sont importées ici et jamais par le processus API : elles sont chargées
+une fois au démarrage de chaque worker, pendant le préchauffage.
+"""
+
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from moviepy import AudioClip, ColorClip, CompositeAudioClip, CompositeVideoClip, ImageClip
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+from composition import (
+    RenderRequest, beats_to_seconds, composition_duration, find_video_path, usable_duration,
+)
+from config import (
+    CLIPS_DIR, TEMP_DIR, DECODER_MAX_READERS, FRAME_CACHE_MB,
+    RENDER_PREWARM_CLIPS, VIDEO_EXTENSIONS, ENCODE_PROFILE, OUTPUT_WIDTH, OUTPUT_HEIGHT,
+)
+from decoder_pool import AUDIO_FPS, DecoderPool, SourceWindow
+from render_cache import hash_file
+from media_index import load_index, poster_path
+
+def precise_cut_video(input_path: str, start_time: float, duration: float, output_path: str) -> bool:
+    """
+    Découpe une vidéo avec précision frame-parfaite en utilisant ffmpeg directement
+    Retourne True si succès, False sinon
+    """
+    # Fichier temporaire propre au processus puis renommage atomique : plusieurs
+    # workers (ou nœuds partageant TEMP_DIR) peuvent découper le même clip en parallèle
+    temp_path = f"{os.path.splitext(output_path)[0]}.{os.getpid()}.tmp.mp4"
+    try:
+        # Utiliser ffmpeg pour un découpage précis
+        # -ss avant -i pour seek rapide, -t pour la durée
+        # (ffmpeg saute à la keyframe précédente via l'index du conteneur puis décode
+        # jusqu'au timestamp exact : aucun gain à lui fournir la table des keyframes)
+        # -c copy ne fonctionne pas pour découpage précis, on doit réencoder
+        cmd = [
+            'ffmpeg', '-y',
+            '-ss', str(start_time),  # Seek au timestamp exact
+            '-i', input_path,
+            '-t', str(duration),  # Durée exacte
+            '-c:v', 'libx264',  # Réencodage nécessaire pour précision frame
+            '-preset', 'ultrafast',  # Rapide pour le rendu
+            '-crf', '18',  # Qualité élevée
+            '-c:a', 'aac',
+            '-b:a', '192k',
+            temp_path
+        ]
+
+        # Afficher la commande complète pour debug
+        cmd_str = ' '.join(cmd)
+        print(f"     🔧 Commande ffmpeg: {cmd_str}")
+
+        result = subprocess.run(cmd, capture_output=True, text=True)
+
+        if result.returncode != 0:
+            print(f"     ❌ Erreur ffmpeg stderr: {result.stderr}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        os.replace(temp_path, output_path)
+        return True
+    except Exception as e:
+        print(f"❌ Erreur ffmpeg: {e}")
+        return False
+
+class RenderSession:
+    """
+    Caches partagés par un ou plusieurs rendus d'un même job :
+    fichiers découpés par ffmpeg et pool de décodeurs
+    """
+
+    def __init__(self, cache_source_frames: bool = False):
+        # Index des médias sources utilisés (chemin -> index ou None)
+        self.media_indexes = {}
+        # Cache pour éviter de découper et charger plusieurs fois le même clip
+        # Clé: (instrument_name, offset, duration) -> chemin du fichier découpé
+        self.cut_clips_cache = {}
+        # Pool de décodeurs partagé : lecteurs ffmpeg bornés + cache LRU des frames
+        # décodées à la taille de la cellule (une frame identique n'est décodée qu'une fois)
+        self.decoder_pool = DecoderPool(
+            max_readers=DECODER_MAX_READERS,
+            max_cache_bytes=FRAME_CACHE_MB * 1024 * 1024,
+            cache_source_frames=cache_source_frames
+        )
+
+    def media_index(self, video_path: str) -> Optional[dict]:
+        """
+        Index du média s'il existe déjà ; amorce la sonde du pool
+        Jamais construit ici : l'indexation (bibliothèque au boot, uploads en arrière-plan)
+        ne doit pas retarder un rendu
+        """
+        if video_path not in self.media_indexes:
+            index = load_index(video_path)
+            if index:
+                self.decoder_pool.seed_info(video_path, index["duration"], index["fps"])
+            self.media_indexes[video_path] = index
+        return self.media_indexes[video_path]
+
+    def close(self):
+        # Statistiques du pool de décodeurs
+        pool_stats = self.decoder_pool.stats()
+        print(f"\n📊 Statistiques du pool de décodeurs:")
+        print(f"   - Frames servies depuis le cache: {pool_stats['hits']}")
+        print(f"   - Frames calculées: {pool_stats['misses']} (décodées depuis la source: {pool_stats['source_decodes']})")
+        print(f"   - Taux de réussite: {pool_stats['hit_rate'] * 100:.1f}%")
+        print(f"   - Évictions de frames: {pool_stats['frame_evictions']}")
+        print(f"   - Lecteurs ouverts: {pool_stats['reader_opens']} (max simultanés: {pool_stats['max_readers']})\n")
+        self.decoder_pool.close()
+
+def build_composition(request: RenderRequest, uploaded_videos: Dict[str, str], width: int, height: int,
+                      session: RenderSession) -> Tuple[CompositeVideoClip, list]:
+    """
+    Composition MoviePy (fond, images fixes, clips animés) à la taille de sortie
+    Retourne aussi les clips qui la composent, à fermer après l'encodage
+    """
+    total_duration = composition_duration(request)
+    cut_clips_cache = session.cut_clips_cache
+    decoder_pool = session.decoder_pool
+
+    # Configuration de la grille
+    grid_cols = request.gridSize.cols
+    grid_rows = request.gridSize.rows
+    cell_width = width // grid_cols
+    cell_height = height // grid_rows
+
+    print(f"🎬 Rendu VideoSequencer - Durée: {total_duration:.2f}s, Grille: {grid_cols}x{grid_rows}, Sortie: {width}x{height}")
+
+    # Fond noir
+    base = ColorClip(size=(width, height), color=(0, 0, 0), duration=total_duration)
+
+    # Créer les frames statiques pour chaque instrument
+    print("Création des images fixes...")
+    static_frames = []
+
+    for inst in request.instruments:
+        # Chercher d'abord dans les uploads, puis dans ./clips/
+        video_path = uploaded_videos.get(inst.name)
+
+        if not video_path:
+            # Chercher avec différentes extensions
+            for ext in VIDEO_EXTENSIONS:
+                potential_path = os.path.join(CLIPS_DIR, f"{inst.name}{ext}")
+                if os.path.exists(potential_path):
+                    video_path = potential_path
+                    break
+
+        if not video_path or not os.path.exists(video_path):
+            print(f"⚠️  Vidéo non trouvée: {inst.name}")
+            continue
+
+        row = inst.gridPosition // grid_cols
+        col = inst.gridPosition % grid_cols
+        x = col * cell_width
+        y = row * cell_height
+
+        # Utiliser l'offset de l'instrument
+        offset = inst.offset
+
+        media = session.media_index(video_path)
+        poster = poster_path(video_path, media, cell_width, cell_height) if media and offset == 0 else None
+        if poster:
+            # Poster assombri pré-calculé par l'indexeur (mêmes pixels, sans décodage)
+            static_frame = ImageClip(np.asarray(Image.open(poster).convert('RGB')))
+        else:
+            # Extraire la frame à l'offset spécifié (via le pool : lecteur partagé et borné)
+            image = decoder_pool.get_frame(SourceWindow(video_path, cell_width, cell_height), offset)
+            # Assombrir l'image statique (30% de luminosité)
+            static_frame = ImageClip((image * 0.3).astype('uint8'))
+        static_frame = static_frame.with_duration(total_duration)
+        static_frame = static_frame.with_position((x, y))
+        static_frames.append(static_frame)
+
+    # Créer les clips animés
+    print(f"Création de {len(request.clips)} clips animés...")
+    animated_clips = []
+
+    cuts_before = len(cut_clips_cache)
+
+    for clip in request.clips:
+        # Trouver l'instrument correspondant
+        inst = next((i for i in request.instruments if i.id == clip.instrumentId), None)
+        if not inst:
+            continue
+
+        # Chercher d'abord dans les uploads, puis dans ./clips/
+        video_path = uploaded_videos.get(inst.name)
+
+        if not video_path:
+            # Chercher avec différentes extensions
+            print(f"     🔍 Recherche vidéo pour: '{inst.name}'")
+            for ext in VIDEO_EXTENSIONS:
+                potential_path = os.path.join(CLIPS_DIR, f"{inst.name}{ext}")
+                print(f"        Essai: {potential_path}")
+                if os.path.exists(potential_path):
+                    video_path = potential_path
+                    print(f"        ✅ Trouvé!")
+                    break
+                else:
+                    print(f"        ❌ N'existe pas")
+
+        if not video_path or not os.path.exists(video_path):
+            print(f"⚠️  Vidéo non trouvée pour instrument: {inst.name}")
+            print(f"     Fichiers disponibles dans {CLIPS_DIR}:")
+            try:
+                files = os.listdir(CLIPS_DIR)
+                for f in sorted(files):
+                    print(f"       - {f}")
+            except Exception as e:
+                print(f"     Erreur listage: {e}")
+            continue
+
+        start_sec = beats_to_seconds(clip.startTime, request.bpm)
+        offset = inst.offset
+        max_duration = inst.maxDuration
+
+        row = inst.gridPosition // grid_cols
+        col = inst.gridPosition % grid_cols
+        x = col * cell_width
+        y = row * cell_height
+
+        # Créer le clip avec offset et maxDuration (indépendant de la durée en beats)
+        # Index existant : durée et fps sans sonde ffmpeg
+        session.media_index(video_path)
+        source_info = decoder_pool.info(video_path)
+        available_duration = source_info.duration - offset
+
+        # Utiliser la portion définie par offset et maxDuration
+        clip_duration = usable_duration(inst, source_info.duration)
+
+        # Debug logging pour diagnostic
+        print(f"  📊 Clip {clip.id} (instrument: {inst.name}):")
+        print(f"     - startTime (beats): {clip.startTime}")
+        print(f"     - start_sec (calculé): {start_sec:.3f}s")
+        print(f"     - offset: {offset:.3f}s")
+        print(f"     - max_duration: {max_duration:.3f}s")
+        print(f"     - video.duration: {source_info.duration:.3f}s")
+        print(f"     - available_duration: {available_duration:.3f}s")
+        print(f"     - clip_duration (final): {clip_duration:.3f}s")
+        print(f"     - position grid: ({row}, {col}) → coords: ({x}, {y})")
+
+        # Vérifier si on a déjà découpé ce même clip (même contenu source + offset + durée)
+        source_hash = hash_file(video_path)
+        cache_key = (source_hash, offset, clip_duration)
+        temp_cut_path = cut_clips_cache.get(cache_key)
+
+        if temp_cut_path:
+            print(f"     - ♻️ Réutilisation du clip en cache")
+        else:
+            # Créer un fichier temporaire pour le clip découpé
+            # Nom basé sur le cache_key (empreinte du contenu source) : deux sources homonymes
+            # mais différentes ne partagent jamais une découpe
+            temp_cut_path = os.path.join(TEMP_DIR, f"cut_{source_hash[:16]}_{offset}_{clip_duration}.mp4")
+
+            if os.path.exists(temp_cut_path):
+                # Découpe déjà produite par un rendu précédent ou un autre nœud (TEMP_DIR partagé) ;
+                # les découpes sont écrites puis renommées : un fichier présent est complet
+                print(f"     - ♻️ Découpe déjà présente dans TEMP_DIR")
+            else:
+                # Découper la vidéo avec ffmpeg pour précision frame-parfaite
+                print(f"     - Découpage précis avec ffmpeg: de {offset:.3f}s, durée {clip_duration:.3f}s")
+                success = precise_cut_video(video_path, offset, clip_duration, temp_cut_path)
+
+                if not success:
+                    print(f"⚠️  Échec découpage ffmpeg pour clip {clip.id}")
+                    continue
+                print(f"     - ✅ Clip découpé")
+
+            # Mettre en cache
+            cut_clips_cache[cache_key] = temp_cut_path
+
+        # Créer une instance positionnée pour ce clip spécifique
+        # Les frames (déjà à la taille de la cellule) sont servies par le pool partagé
+        window = SourceWindow(temp_cut_path, cell_width, cell_height)
+        # Placement enregistré : le lecteur du fichier n'est retenu que pendant qu'il joue
+        video_cut = decoder_pool.make_clip(window, start_sec)
+        video_cut = video_cut.with_position((x, y))
+
+        print(f"     - Clip ajouté à la position {start_sec:.3f}s dans la composition")
+        animated_clips.append(video_cut)
+
+    # Statistiques du cache
+    print(f"\n📊 Statistiques du cache:")
+    print(f"   - Clips traités: {len(request.clips)}")
+    new_cuts = len(cut_clips_cache) - cuts_before
+    print(f"   - Clips uniques découpés: {new_cuts}")
+    print(f"   - Réutilisations: {len(request.clips) - new_cuts}")
+    print(f"   - Gain: {((len(request.clips) - new_cuts) / len(request.clips) * 100):.1f}%\n")
+
+    # Composer
+    print("Composition finale...")
+    parts = [base] + static_frames + animated_clips
+    final = CompositeVideoClip(parts, size=(width, height))
+    return final, parts
+
+def close_composition(final: CompositeVideoClip, parts: list):
+    final.close()
+    for part in parts:
+        part.close()
+
+def render_composition(
+    request_data: dict,
+    uploaded_videos: Dict[str, str],
+    output_path: str,
+    width: int = OUTPUT_WIDTH,
+    height: int = OUTPUT_HEIGHT,
+    profile: Optional[dict] = None,
+    session: Optional[RenderSession] = None,
+    start: float = 0.0,
+    end: Optional[float] = None,
+    audio: bool = True,
+    progressive: bool = False
+) -> str:
+    """
+    Rendu synchrone de la composition vers output_path
+    Exécuté dans un worker de rendu : la requête arrive sous forme de dict sérialisable
+    Sans session fournie, les caches ne vivent que le temps de ce rendu
+    start / end : n'encoder qu'un segment temporel (rendu distribué)
+    audio=False : vidéo seule (segments du rendu distribué, l'audio est encodé à part)
+    progressive=True : audio et vidéo produits ensemble au fil de l'encodage (sortie HLS,
+    voir write_progressive)
+    """
+    request = RenderRequest(**request_data)
+    profile = profile or ENCODE_PROFILE
+    owns_session = session is None
+    if owns_session:
+        session = RenderSession()
+
+    final, parts = build_composition(request, uploaded_videos, width, height, session)
+    if not audio:
+        final = final.without_audio()
+    # Segment temporel (rendu distribué) : seule la plage [start, end) est encodée
+    if start > 0 or end is not None:
+        end_label = "fin" if end is None else f"{end:.3f}s"
+        print(f"✂️ Segment {start:.3f}s → {end_label}")
+        final = final.subclipped(start, end)
+
+    # Rendu
+    print(f"Rendu vers: {output_path}")
+    # Utiliser des paramètres ffmpeg pour forcer la précision du découpage
+    # -avoid_negative_ts make_zero: évite les timestamps négatifs
+    # -copyts: préserve les timestamps originaux
+    # Piste audio temporaire à côté de la sortie (et non dans le répertoire courant)
+    if progressive:
+        write_progressive(final, output_path, profile)
+    else:
+        final.write_videofile(
+            output_path,
+            **profile,
+            audio=audio,
+            temp_audiofile_path=os.path.dirname(output_path),
+            logger=None  # Désactiver les logs verbeux
+        )
+
+    # Nettoyer
+    close_composition(final, parts)
+    if owns_session:
+        session.close()
+
+    print(f"✅ Rendu terminé: {os.path.basename(output_path)}")
+
+    return output_path
+
+def render_audio(request_data: dict, uploaded_videos: Dict[str, str], output_path: str,
+                 duration: float, profile: Optional[dict] = None) -> str:
+    """
+    Piste audio complète de la composition, encodée en une seule fois (rendu distribué) :
+    des segments encodés chacun avec leur audio accumuleraient le décalage d'amorçage
+    de l'encodeur AAC à chaque jointure
+    duration : durée réelle du rendu ; la piste est complétée par du silence
+    """
+    request = RenderRequest(**request_data)
+    profile = profile or ENCODE_PROFILE
+    session = RenderSession()
+    final, parts = build_composition(request, uploaded_videos, OUTPUT_WIDTH, OUTPUT_HEIGHT, session)
+    try:
+        silence = AudioClip(
+            lambda t: np.zeros((len(t), 2)) if np.ndim(t) else np.zeros(2),
+            duration=duration,
+            fps=AUDIO_FPS
+        )
+        tracks = [silence]
+        if final.audio is not None:
+            tracks.append(final.audio.subclipped(0, min(duration, final.audio.duration)))
+        print(f"🔊 Piste audio de la composition ({duration:.3f}s) vers: {output_path}")
+        CompositeAudioClip(tracks).with_duration(duration).write_audiofile(
+            output_path,
+            fps=AUDIO_FPS,
+            codec=profile["audio_codec"],
+            bitrate=profile.get("audio_bitrate"),
+            logger=None
+        )
+    finally:
+        close_composition(final, parts)
+        session.close()
+    return output_path
+
+def composition_extent(request_data: dict, uploaded_videos: Dict[str, str]) -> float:
+    """
+    Durée réelle du rendu : les clips animés durent le temps de leur vidéo source
+    (offset / maxDuration) et peuvent dépasser la fin de la composition en beats
+    """
+    request = RenderRequest(**request_data)
+    extent = composition_duration(request)
+    instruments = {inst.id: inst for inst in request.instruments}
+    decoder_pool = DecoderPool(max_readers=DECODER_MAX_READERS, max_cache_bytes=0)
+    try:
+        for clip in request.clips:
+            inst = instruments.get(clip.instrumentId)
+            video_path = find_video_path(inst.name, uploaded_videos) if inst else None
+            if not video_path:
+                continue
+            media = load_index(video_path)
+            source_duration = media["duration"] if media else decoder_pool.info(video_path).duration
+            clip_duration = usable_duration(inst, source_duration)
+            extent = max(extent, beats_to_seconds(clip.startTime, request.bpm) + clip_duration)
+    finally:
+        decoder_pool.close()
+    return extent
+
+def render_batch(jobs: List[dict], uploaded_videos: Dict[str, str]) -> List[str]:
+    """
+    Rend plusieurs variantes d'une composition dans un seul job
+    Chaque job : {request, output_path, width, height, profile}
+    Découpes ffmpeg et sondes sont partagées, et toutes les variantes sont encodées en
+    une seule passe sur la ligne de temps (voir write_lockstep) : une frame source est
+    décodée une fois puis redimensionnée pour chaque taille de cellule
+    """
+    # Plusieurs tailles de cellule : garder aussi les frames source pour ne décoder qu'une fois
+    cell_sizes = {
+        (job["width"] // job["request"]["gridSize"]["cols"], job["height"] // job["request"]["gridSize"]["rows"])
+        for job in jobs
+    }
+    session = RenderSession(cache_source_frames=len(cell_sizes) > 1)
+    print(f"📦 Rendu groupé de {len(jobs)} variantes")
+    compositions = []
+    try:
+        for job in jobs:
+            request = RenderRequest(**job["request"])
+            compositions.append(build_composition(request, uploaded_videos, job["width"], job["height"], session))
+        write_lockstep([
+            (final, job["output_path"], job["profile"])
+            for (final, _), job in zip(compositions, jobs)
+        ])
+    finally:
+        for final, parts in compositions:
+            close_composition(final, parts)
+        session.close()
+
+    for job in jobs:
+        print(f"✅ Rendu terminé: {os.path.basename(job['output_path'])}")
+    return [job["output_path"] for job in jobs]
+
+def write_lockstep(outputs: List[tuple]):
+    """
+    Encode plusieurs compositions en une passe : un encodeur ffmpeg par sortie, alimentés
+    dans l'ordre chronologique commun. Rendues l'une après l'autre, chaque variante
+    redécoderait ses sources (le cache LRU ne garde que quelques secondes de frames) ;
+    en lockstep, les variantes demandent les mêmes frames source au même moment.
+    outputs : (composition, chemin de sortie, profil d'encodage)
+    """
+    writers = []
+    audio_paths = []
+    try:
+        for final, output_path, profile in outputs:
+            # Audio encodé d'abord puis multiplexé par l'encodeur vidéo, comme write_videofile
+            audio_path = None
+            if final.audio is not None:
+                audio_path = f"{os.path.splitext(output_path)[0]}.{os.getpid()}.audio.m4a"
+                audio_paths.append(audio_path)
+                final.audio.write_audiofile(
+                    audio_path,
+                    fps=AUDIO_FPS,
+                    nbytes=4,
+                    buffersize=2000,
+                    codec=profile["audio_codec"],
+                    bitrate=profile.get("audio_bitrate"),
+                    logger=None
+                )
+            writers.append(FFMPEG_VideoWriter(
+                output_path,
+                final.size,
+                profile["fps"],
+                codec=profile["codec"],
+                audiofile=audio_path,
+                preset=profile.get("preset", "medium"),
+                bitrate=profile.get("bitrate"),
+                ffmpeg_params=profile.get("ffmpeg_params"),
+                pixel_format="rgba" if final.mask is not None else "rgb24",
+            ))
+
+        # Instants de toutes les sorties (fps et durées peuvent différer), dans l'ordre chronologique
+        schedule = sorted(
+            (frame_index / profile["fps"], position)
+            for position, (final, _, profile) in enumerate(outputs)
+            for frame_index in range(int(final.duration * profile["fps"]))
+        )
+        print(f"🎞️ Encodage en lockstep de {len(outputs)} sorties ({len(schedule)} frames)")
+        for t, position in schedule:
+            final = outputs[position][0]
+            frame = final.get_frame(t)
+            if frame.dtype != 'uint8':
+                frame = frame.astype('uint8')
+            if final.mask is not None:
+                frame = np.dstack([frame, (255 * final.mask.get_frame(t)).astype('uint8')])
+            writers[position].write_frame(frame)
+    finally:
+        for writer in writers:
+            writer.close()
+        for audio_path in audio_paths:
+            if os.path.exists(audio_path):
+                os.remove(audio_path)
+
+def write_progressive(final: CompositeVideoClip, output_path: str, profile: dict):
+    """
+    Encode la composition avec l'audio produit au fil de l'eau : write_videofile encode
+    toute la piste audio avant la première frame vidéo, si bien qu'un rendu HLS ne publie
+    son premier segment qu'après ce préalable. Ici l'audio (PCM) arrive à ffmpeg par un
+    second pipe, écrit par un thread pendant que les frames passent par stdin ; ffmpeg
+    entrelace les deux et le premier segment sort après quelques secondes de rendu.
+    """
+    fps = profile["fps"]
+    width, height = final.size
+    cmd = [
+        FFMPEG_BINARY, '-y', '-loglevel', 'error',
+        '-f', 'rawvideo', '-vcodec', 'rawvideo', '-s', f'{width}x{height}',
+        '-pix_fmt', 'rgb24', '-r', f'{fps:.02f}', '-i', '-',
+    ]
+    audio_read = audio_write = None
+    if final.audio is not None:
+        audio_read, audio_write = os.pipe()
+        # Format connu : pas d'analyse à l'ouverture (ffmpeg lirait sinon plusieurs secondes
+        # d'audio avant la première frame)
+        cmd += ['-f', 's16le', '-ar', str(AUDIO_FPS), '-ac', '2',
+                '-probesize', '32', '-analyzeduration', '0', '-i', f'pipe:{audio_read}',
+                '-map', '0:v', '-map', '1:a', '-acodec', profile["audio_codec"]]
+        if profile.get("audio_bitrate"):
+            cmd += ['-b:a', profile["audio_bitrate"]]
+    cmd += ['-vcodec', profile["codec"], '-preset', profile.get("preset", "medium"), '-pix_fmt', 'yuv420p']
+    if profile.get("bitrate"):
+        cmd += ['-b:v', profile["bitrate"]]
+    cmd += list(profile.get("ffmpeg_params") or []) + [output_path]
+
+    audio_errors = []
+    # Avance maximale de l'audio sur la dernière frame envoyée : ffmpeg lit sinon l'audio
+    # bien plus vite que la vidéo et le tamponne (décodages audio faits trop tôt, lecteurs
+    # ouverts en même temps que ceux de la vidéo). L'audio restant en avance, ffmpeg n'attend
+    # jamais de l'audio pour une vidéo déjà reçue (l'attente est de toute façon bornée,
+    # au cas où ffmpeg réclamerait plus d'audio d'avance).
+    audio_lead = 1.0
+    chunk_size = 2000
+    progress = threading.Condition()
+    video_t = [0.0]
+
+    def feed_audio():
+        try:
+            with os.fdopen(audio_write, 'wb') as pipe:
+                # Piste complétée par du silence jusqu'à la fin de la vidéo
+                track = final.audio.with_duration(final.duration)
+                chunks = track.iter_chunks(chunksize=chunk_size, fps=AUDIO_FPS, quantize=True, nbytes=2)
+                for index, chunk in enumerate(chunks):
+                    with progress:
+                        progress.wait_for(
+                            lambda: index * chunk_size / AUDIO_FPS <= video_t[0] + audio_lead, timeout=1.0
+                        )
+                    pipe.write(chunk.tobytes())
+        except Exception as e:
+            audio_errors.append(e)
+
+    with tempfile.TemporaryFile() as log:
+        process = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=log,
+            pass_fds=(audio_read,) if audio_read is not None else (),
+        )
+        audio_thread = None
+        if audio_read is not None:
+            # Extrémité de lecture transmise à ffmpeg : le thread s'arrête si ffmpeg se termine
+            os.close(audio_read)
+            audio_thread = threading.Thread(target=feed_audio, daemon=True)
+            audio_thread.start()
+        try:
+            for frame_index in range(int(final.duration * fps)):
+                frame = final.get_frame(frame_index / fps)
+                if frame.dtype != 'uint8':
+                    frame = frame.astype('uint8')
+                process.stdin.write(frame.tobytes())
+                with progress:
+                    video_t[0] = frame_index / fps
+                    progress.notify()
+        except BrokenPipeError:
+            pass
+        finally:
+            # Plus de frames (fin ou erreur) : l'audio n'attend plus la vidéo
+            with progress:
+                video_t[0] = float('inf')
+                progress.notify()
+            process.stdin.close()
+            if audio_thread is not None:
+                audio_thread.join()
+            process.wait()
+        if process.returncode != 0:
+            log.seek(0)
+            raise IOError(f"Encodage ffmpeg échoué: {log.read().decode(errors='replace')[-500:]}")
+    if audio_errors:
+        raise audio_errors[0]
+
+def warm_up() -> dict:
+    """
+    Initialiseur des workers : vérifie ffmpeg, charge les codecs utilisés par le rendu
+    et, si RENDER_PREWARM_CLIPS=1, sonde toute la bibliothèque CLIPS_DIR
+    """
+    started = time.time()
+    state = {"ready": False, "pid": os.getpid(), "ffmpeg": FFMPEG_BINARY}
+    try:
+        # Encodeurs disponibles
+        result = subprocess.run(
+            [FFMPEG_BINARY, '-hide_banner', '-encoders'],
+            capture_output=True, text=True, timeout=30
+        )
+        missing = [
+            codec for codec in (ENCODE_PROFILE["codec"], ENCODE_PROFILE["audio_codec"])
+            if f" {codec} " not in result.stdout
+        ]
+        if result.returncode != 0 or missing:
+            raise RuntimeError(f"encodeurs ffmpeg manquants: {missing or result.stderr}")
+
+        # Encodage minuscule pour charger libx264/aac (et les pages du binaire) en mémoire
+        subprocess.run(
+            [
+                FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error',
+                '-f', 'lavfi', '-i', 'color=c=black:s=64x64:d=0.1',
+                '-f', 'lavfi', '-i', 'anullsrc=r=44100:cl=stereo',
+                '-t', '0.1',
+                '-c:v', ENCODE_PROFILE["codec"], '-c:a', ENCODE_PROFILE["audio_codec"],
+                '-f', 'null', '-'
+            ],
+            capture_output=True, check=True, timeout=30
+        )
+
+        probed = 0
+        if RENDER_PREWARM_CLIPS and os.path.isdir(CLIPS_DIR):
+            for filename in sorted(os.listdir(CLIPS_DIR)):
+                if os.path.splitext(filename)[1].lower() in VIDEO_EXTENSIONS:
+                    try:
+                        ffmpeg_parse_infos(os.path.join(CLIPS_DIR, filename))
+                        probed += 1
+                    except Exception as e:
+                        print(f"⚠️ Sonde impossible pour {filename}: {e}")
+        state["probed_clips"] = probed
+        state["ready"] = True
+    except Exception as e:
+        state["error"] = str(e)
+        print(f"❌ Préchauffage du worker {os.getpid()} échoué: {e}")
+
+    state["warmup_seconds"] = round(time.time() - started, 3)
+    if state["ready"]:
+        print(f"🔥 Worker {os.getpid()} prêt en {state['warmup_seconds']:.2f}s")
+    return state
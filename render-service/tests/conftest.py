@@ -0,0 +1,29 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Modules du service à plat dans render-service/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_video(tmp_path):
+    """Génère une courte vidéo de test (mire + bip) avec le ffmpeg de MoviePy"""
+    from moviepy.config import FFMPEG_BINARY
+
+    def make(name: str = "clip.mp4", duration: float = 2.0, size: str = "64x36", fps: int = 30) -> str:
+        path = str(tmp_path / name)
+        subprocess.run(
+            [
+                FFMPEG_BINARY, '-y', '-loglevel', 'error',
+                '-f', 'lavfi', '-i', f'testsrc=duration={duration}:size={size}:rate={fps}',
+                '-f', 'lavfi', '-i', f'sine=duration={duration}',
+                '-c:v', 'libx264', '-c:a', 'aac', '-shortest', path
+            ],
+            check=True
+        )
+        return path
+
+    return make
@@ -0,0 +1,79 @@
+from moviepy import CompositeVideoClip
+
+from decoder_pool import DecoderPool, SourceWindow
+
+
+def test_reader_cap_holds_with_overlapping_placements(make_video):
+    # Plus de placements simultanés que de lecteurs autorisés : la limite reste stricte
+    paths = [make_video(f"cut_{i}.mp4") for i in range(8)]
+    pool = DecoderPool(max_readers=4, max_cache_bytes=0)
+    try:
+        clips = [pool.make_clip(SourceWindow(path, 32, 18), 0.0) for path in paths]
+        for frame in range(30):
+            for clip in clips:
+                clip.get_frame(frame / 30)
+                assert len(pool._readers) <= 4
+        assert pool.max_open_readers == 4
+        assert pool.overcommitted
+    finally:
+        pool.close()
+
+
+def test_readers_are_released_after_last_placement(make_video):
+    # Placements successifs : un seul lecteur ouvert à la fois, fermé à la fin de son placement
+    paths = [make_video(f"cut_{i}.mp4", duration=1.0) for i in range(4)]
+    pool = DecoderPool(max_readers=8, max_cache_bytes=0)
+    try:
+        clips = [pool.make_clip(SourceWindow(path, 32, 18), float(i)) for i, path in enumerate(paths)]
+        final = CompositeVideoClip(clips, size=(32, 18)).with_duration(4.0)
+        for frame in range(120):
+            final.get_frame(frame / 30)
+            assert len(pool._readers) <= 1
+        assert pool.reader_opens == len(paths)
+        assert pool.reader_evictions == 0
+        assert not pool.overcommitted
+    finally:
+        pool.close()
+
+
+def test_idle_readers_are_capped(make_video):
+    paths = [make_video(f"source_{i}.mp4") for i in range(6)]
+    pool = DecoderPool(max_readers=2, max_cache_bytes=0)
+    try:
+        for path in paths:
+            pool.get_frame(SourceWindow(path, 32, 18), 0.5)
+        assert pool.reader_opens == len(paths)
+        assert len(pool._readers) == 2
+    finally:
+        pool.close()
+
+
+def test_info_does_not_open_a_reader(make_video):
+    path = make_video(duration=3.0)
+    pool = DecoderPool(max_readers=1, max_cache_bytes=0)
+    try:
+        info = pool.info(path)
+        assert abs(info.duration - 3.0) < 0.1
+        assert info.fps == 30
+        assert info.has_audio
+        assert pool.reader_opens == 0
+    finally:
+        pool.close()
+
+
+def test_audio_readers_count_in_cap(make_video):
+    path = make_video(duration=3.0)
+    pool = DecoderPool(max_readers=1, max_cache_bytes=0)
+    try:
+        first = pool.make_clip(SourceWindow(path, 32, 18), 0.0)
+        second = pool.make_clip(SourceWindow(path, 16, 9), 0.0)
+        # Aucun lecteur ouvert à la construction des clips
+        assert pool.reader_opens == 0
+        assert first.audio.get_frame(2.5).shape == (2,)
+        assert second.audio.duration == first.audio.duration
+        first.get_frame(1.0)
+        # Un lecteur vidéo et un lecteur audio pour le même fichier : jamais plus d'un ouvert
+        assert pool.max_open_readers == 1
+        assert not hasattr(next(iter(pool._readers.values())), "array")
+    finally:
+        pool.close()
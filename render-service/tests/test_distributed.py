@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+import distributed
+from distributed import SegmentCoordinator, segment_bounds
+
+NODES = ["http://node-a", "http://node-b"]
+
+
+def make_coordinator(tmp_path, **overrides):
+    options = dict(
+        nodes=NODES, segments_dir=str(tmp_path), segment_seconds=1.0, retries=1,
+        timeout=5.0, node_concurrency=1, straggler_timeout=5.0,
+    )
+    options.update(overrides)
+    return SegmentCoordinator(**options)
+
+
+def stub_nodes(monkeypatch, tmp_path, duration=4.0, delays=None, failing=()):
+    """Remplace les appels HTTP : chaque nœud « rend » en écrivant le fichier demandé"""
+    calls = []
+    lock = threading.Lock()
+
+    def post_json(url, payload, timeout):
+        node, path = url.rsplit("/render/", 1)
+        if path == "plan":
+            return {"duration": duration}
+        with lock:
+            calls.append((node, payload["filename"]))
+        time.sleep((delays or {}).get(node, 0.01))
+        if node in failing:
+            raise RuntimeError("nœud en panne")
+        with open(os.path.join(tmp_path, payload["filename"]), "w") as f:
+            f.write("segment")
+        return {"filename": payload["filename"]}
+
+    monkeypatch.setattr(distributed, "_post_json", post_json)
+    return calls
+
+
+def test_segment_bounds_are_frame_aligned():
+    assert segment_bounds(2.5, 1.0, 30) == [(0.0, 1.0), (1.0, 2.0), (2.0, 2.5)]
+    # Durée non multiple de la frame : arrondie à la frame la plus proche
+    assert segment_bounds(1.01, 10.0, 30) == [(0.0, 1.0)]
+    assert segment_bounds(0.5, 0.001, 4)[:2] == [(0.0, 0.25), (0.25, 0.5)]
+
+
+def test_segment_bounds_zero_frames():
+    assert segment_bounds(0.0, 1.0, 30) == []
+    assert segment_bounds(0.01, 1.0, 30) == []
+
+
+def test_empty_render_is_rejected(monkeypatch, tmp_path):
+    stub_nodes(monkeypatch, tmp_path, duration=0.0)
+    coordinator = make_coordinator(tmp_path)
+    with pytest.raises(RuntimeError, match="Rendu vide"):
+        asyncio.run(coordinator.render("k" * 64, {}, {}, str(tmp_path / "out.mp4"), "default", 30))
+
+
+def test_segments_spread_across_nodes(monkeypatch, tmp_path):
+    calls = stub_nodes(monkeypatch, tmp_path, duration=4.0, delays={node: 0.05 for node in NODES})
+    coordinator = make_coordinator(tmp_path)
+    concatenated = []
+
+    async def concat(segment_paths, audio_path, output_path):
+        concatenated.append((segment_paths, audio_path))
+
+    monkeypatch.setattr(coordinator, "_concat", concat)
+    asyncio.run(coordinator.render("k" * 64, {}, {}, str(tmp_path / "out.mp4"), "default", 30))
+
+    # 4 segments vidéo + la piste audio, répartis à parts quasi égales
+    per_node = {node: sum(1 for called, _ in calls if called == node) for node in NODES}
+    assert sum(per_node.values()) == 5
+    assert sorted(per_node.values()) == [2, 3]
+    assert coordinator.active == {node: 0 for node in NODES}
+    segment_paths, audio_path = concatenated[0]
+    assert [os.path.basename(path) for path in segment_paths] == [
+        f"seg_{'k' * 16}_{index:04d}_0.mp4" for index in range(4)
+    ]
+    assert audio_path.endswith("_audio_0.m4a")
+    # Segments supprimés après la concaténation
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("seg_")]
+
+
+def test_failed_segment_is_retried_on_another_node(monkeypatch, tmp_path):
+    calls = stub_nodes(monkeypatch, tmp_path, failing={NODES[0]})
+    coordinator = make_coordinator(tmp_path)
+    path = asyncio.run(coordinator._render_segment("k" * 64, "0", {"start": 0.0, "end": 1.0}, ".mp4"))
+
+    assert [node for node, _ in calls] == NODES
+    assert path.endswith("_0000_1.mp4")
+    assert os.path.exists(path)
+
+
+def test_segment_fails_after_retries(monkeypatch, tmp_path):
+    calls = stub_nodes(monkeypatch, tmp_path, failing=set(NODES))
+    coordinator = make_coordinator(tmp_path, retries=1)
+    with pytest.raises(RuntimeError, match="Segment 0 en échec"):
+        asyncio.run(coordinator._render_segment("k" * 64, "0", {"start": 0.0, "end": 1.0}, ".mp4"))
+    assert len(calls) == 2
+    assert coordinator.active == {node: 0 for node in NODES}
+
+
+def test_straggler_is_speculatively_redispatched(monkeypatch, tmp_path):
+    calls = stub_nodes(monkeypatch, tmp_path, delays={NODES[0]: 0.5, NODES[1]: 0.01})
+    coordinator = make_coordinator(tmp_path, straggler_timeout=0.05)
+
+    async def run():
+        path = await coordinator._render_segment("k" * 64, "0", {"start": 0.0, "end": 1.0}, ".mp4")
+        # Laisser la tentative lente se terminer : son fichier doit être supprimé
+        await asyncio.sleep(0.7)
+        return path
+
+    path = asyncio.run(run())
+    assert [node for node, _ in calls] == NODES
+    assert path.endswith("_0000_1.mp4")
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
+    assert coordinator.active == {node: 0 for node in NODES}
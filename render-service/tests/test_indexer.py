@@ -0,0 +1,65 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from config import INDEX_GRID_SIZES, OUTPUT_HEIGHT, OUTPUT_WIDTH
+from decoder_pool import DecoderPool, SourceWindow
+from indexer import build_index
+from media_index import INDEX_FILENAME, index_dir_for, load_index, poster_path
+
+
+def test_load_index_is_invalidated_when_the_file_changes(make_video):
+    path = make_video()
+    index = build_index(path, previews=False)
+    assert load_index(path) == index
+
+    # Même taille, mtime différent
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert load_index(path) is None
+
+    # Réindexé, puis taille différente
+    build_index(path, previews=False)
+    assert load_index(path) is not None
+    with open(path, "ab") as f:
+        f.write(b"\0")
+    assert load_index(path) is None
+
+
+def test_index_without_previews(make_video):
+    path = make_video()
+    index = build_index(path, previews=False)
+    index_dir = index_dir_for(path)
+
+    assert os.path.isfile(os.path.join(index_dir, INDEX_FILENAME))
+    assert len(index["posters"]) == len(INDEX_GRID_SIZES)
+    for filename in index["posters"]:
+        assert os.path.isfile(os.path.join(index_dir, filename))
+    assert "thumbnail" not in index and "filmstrip" not in index
+    assert not os.path.exists(os.path.join(index_dir, "thumb.jpg"))
+    assert not os.path.exists(os.path.join(index_dir, "filmstrip.jpg"))
+
+
+def test_index_with_previews(make_video):
+    path = make_video(duration=3.0)
+    index = build_index(path)
+    assert index["thumbnail"] == "thumb.jpg"
+    assert index["filmstrip"]["count"] == 3
+    assert os.path.isfile(os.path.join(index_dir_for(path), "filmstrip.jpg"))
+
+
+def test_posters_match_the_dimmed_frame(make_video):
+    path = make_video(size="320x180")
+    index = build_index(path, previews=False)
+    pool = DecoderPool(max_readers=1, max_cache_bytes=0)
+    try:
+        for rows, cols in INDEX_GRID_SIZES:
+            width, height = OUTPUT_WIDTH // cols, OUTPUT_HEIGHT // rows
+            # Mêmes pixels que l'image fixe calculée par le rendu sans index
+            expected = (pool.get_frame(SourceWindow(path, width, height), 0.0) * 0.3).astype('uint8')
+            poster = np.asarray(Image.open(poster_path(path, index, width, height)).convert('RGB'))
+            assert poster.shape == (height, width, 3)
+            assert np.array_equal(poster, expected)
+    finally:
+        pool.close()
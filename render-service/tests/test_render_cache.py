@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+import time
+
+import httpx
+
+from render_cache import RenderCache, render_key
+
+REQUEST = {"bpm": 120, "clips": [{"id": "c1", "startTime": 0}], "gridSize": {"rows": 1, "cols": 1}}
+MEDIA = {"kick": "a" * 64}
+PROFILE = {"encode": {"codec": "libx264", "fps": 30}, "size": [1920, 1080]}
+
+
+def write_render(directory, name: str, size: int) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+
+def test_render_key_ignores_dict_order():
+    reordered_request = {"gridSize": {"cols": 1, "rows": 1}, "clips": [{"startTime": 0, "id": "c1"}], "bpm": 120}
+    reordered_profile = {"size": [1920, 1080], "encode": {"fps": 30, "codec": "libx264"}}
+    assert list(reordered_request) != list(REQUEST)
+    assert render_key(reordered_request, MEDIA, reordered_profile) == render_key(REQUEST, MEDIA, PROFILE)
+
+
+def test_render_key_changes_with_media_and_profile():
+    key = render_key(REQUEST, MEDIA, PROFILE)
+    assert render_key(REQUEST, {"kick": "b" * 64}, PROFILE) != key
+    assert render_key(REQUEST, MEDIA, {**PROFILE, "size": [1080, 1080]}) != key
+    assert render_key(REQUEST, MEDIA, {**PROFILE, "encode": {"codec": "libx264", "fps": 25}}) != key
+
+
+def test_lru_eviction_under_budget(tmp_path):
+    cache = RenderCache(str(tmp_path), max_bytes=250)
+    for name in ("a", "b"):
+        cache.store(name, write_render(tmp_path, f"{name}.mp4", 100))
+        time.sleep(0.01)
+    # a consulté en dernier : b est le moins récemment utilisé
+    assert cache.lookup("a")
+    cache.store("c", write_render(tmp_path, "c.mp4", 100))
+
+    assert cache.lookup("b") is None
+    assert not os.path.exists(tmp_path / "b.mp4")
+    assert cache.lookup("a") and cache.lookup("c")
+
+
+def test_eviction_never_removes_kept_entry(tmp_path):
+    cache = RenderCache(str(tmp_path), max_bytes=50)
+    cache.store("a", write_render(tmp_path, "a.mp4", 100))
+    # Seule entrée, plus grosse que le budget : conservée
+    assert cache.lookup("a")
+    cache.store("b", write_render(tmp_path, "b.mp4", 100))
+    assert cache.lookup("a") is None
+    assert cache.lookup("b") == str(tmp_path / "b.mp4")
+
+
+def test_leased_entries_are_not_evicted(tmp_path):
+    cache = RenderCache(str(tmp_path), max_bytes=150, lease_seconds=60)
+    cache.store("a", write_render(tmp_path, "a.mp4", 100))
+    cache.store("b", write_render(tmp_path, "b.mp4", 100))
+    # a vient d'être servi : budget dépassé le temps du bail
+    assert cache.lookup("a") and cache.lookup("b")
+
+    cache._entries["a"]["last_access"] -= 120
+    assert cache.touch("b.mp4")
+    cache.store("c", write_render(tmp_path, "c.mp4", 100))
+    assert cache.lookup("a") is None
+    assert cache.lookup("b") and cache.lookup("c")
+
+
+def test_lookup_drops_missing_files(tmp_path):
+    cache = RenderCache(str(tmp_path), max_bytes=1000)
+    cache.store("a", write_render(tmp_path, "a.mp4", 10))
+    os.remove(tmp_path / "a.mp4")
+    assert cache.lookup("a") is None
+    assert "a" not in cache._entries
+    # Index persisté sans l'entrée
+    assert RenderCache(str(tmp_path), max_bytes=1000)._entries == {}
+
+
+def test_concurrent_identical_renders_share_one_render(tmp_path, monkeypatch):
+    import main
+
+    renders = []
+
+    async def render(request_data, uploaded_videos, output_path, **options):
+        renders.append(output_path)
+        await asyncio.sleep(0.2)
+        return write_render(os.path.dirname(output_path), os.path.basename(output_path), 10)
+
+    monkeypatch.setattr(main, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "render_cache", RenderCache(str(tmp_path), max_bytes=1000))
+    monkeypatch.setattr(main, "coordinator", None)
+    monkeypatch.setattr(main.render_workers, "render", render)
+
+    composition = {
+        "bpm": 120, "gridSize": {"rows": 1, "cols": 1},
+        "instruments": [{"id": "a", "name": "introuvable", "gridPosition": 0}],
+        "clips": [{"id": "c1", "instrumentId": "a", "startTime": 0, "duration": 1}],
+    }
+
+    async def post_twice():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[
+                client.post("/render", data={"data": json.dumps(composition)}) for _ in range(2)
+            ])
+
+    responses = asyncio.run(post_twice())
+    assert [response.status_code for response in responses] == [200, 200]
+    assert sorted(response.headers["X-Render-Cache"] for response in responses) == ["miss", "shared"]
+    assert len(renders) == 1
+    assert responses[0].content == responses[1].content
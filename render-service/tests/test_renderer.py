@@ -0,0 +1,50 @@
+import os
+import time
+
+import numpy as np
+from moviepy import AudioClip, VideoClip
+
+from config import ENCODE_PROFILE
+from renderer import write_progressive
+
+HLS_TEST_PROFILE = {
+    **ENCODE_PROFILE,
+    "preset": 'ultrafast',
+    "ffmpeg_params": ENCODE_PROFILE["ffmpeg_params"] + [
+        '-f', 'hls', '-hls_time', '1', '-hls_playlist_type', 'event',
+        '-hls_segment_type', 'fmp4', '-hls_flags', 'independent_segments+temp_file',
+        '-force_key_frames', 'expr:gte(t,n_forced*1)',
+    ],
+}
+
+
+def test_hls_segment_is_published_before_render_ends(tmp_path):
+    duration = 6.0
+    first_segment = str(tmp_path / "index0.m4s")
+    audio_times = []
+    published = []
+
+    def video_frame(t):
+        # Premier segment publié pendant que les frames sont encore produites :
+        # noter l'instant vidéo et jusqu'où l'audio a été produit à ce moment-là
+        if not published and os.path.exists(first_segment):
+            published.append((t, max(audio_times)))
+        time.sleep(0.01)
+        return np.zeros((36, 64, 3), dtype='uint8')
+
+    def audio_frame(t):
+        audio_times.append(float(np.max(t)))
+        return np.zeros((len(t), 2)) if np.ndim(t) else np.zeros(2)
+
+    clip = VideoClip(video_frame, duration=duration)
+    clip = clip.with_audio(AudioClip(audio_frame, duration=duration, fps=44100))
+    write_progressive(clip, str(tmp_path / "index.m3u8"), HLS_TEST_PROFILE)
+
+    assert published, "aucun segment publié avant la dernière frame"
+    video_t, audio_t = published[0]
+    assert video_t < duration - 1
+    # L'audio n'a pas été encodé d'avance : il suit la vidéo
+    assert audio_t < duration - 1
+    assert max(audio_times) >= duration - 0.1
+    segments = [name for name in os.listdir(tmp_path) if name.endswith(".m4s")]
+    assert len(segments) >= int(duration)
@@ -0,0 +1,155 @@
+"""
+Workers de rendu VideoSequencer
+
+Pool de processus démarrés au boot (contexte "spawn" : le processus API ne
+charge jamais MoviePy). Chaque worker se préchauffe dans son initialiseur ;
+le service n'est prêt que lorsque tous les workers ont terminé ce préchauffage.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+# Délai maximal de préchauffage d'un worker (sonde de la bibliothèque comprise)
+WARMUP_TIMEOUT = 300
+
+
+class RenderWorkers:
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.statuses: List[dict] = []
+        self.ready = False
+        self.error: Optional[str] = None
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        context = multiprocessing.get_context("spawn")
+        # Chaque worker publie l'état de son préchauffage sur cette file
+        self._warm_queue = context.Queue()
+        return ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=context,
+            initializer=_warm_up,
+            initargs=(self._warm_queue,),
+        )
+
+    async def start(self):
+        """Démarre les workers et attend leur préchauffage"""
+        self.executor = self._create_executor()
+        await self._warm()
+
+    async def _warm(self):
+        self.ready = False
+        self.error = None
+        self.statuses = []
+        loop = asyncio.get_running_loop()
+        print(f"🚀 Démarrage de {self.size} workers de rendu...")
+        try:
+            # Une tâche par worker : le pool lance un nouveau processus tant qu'aucun n'est libre
+            for _ in range(self.size):
+                loop.run_in_executor(self.executor, _noop)
+            for _ in range(self.size):
+                status = await asyncio.to_thread(self._warm_queue.get, True, WARMUP_TIMEOUT)
+                self.statuses.append(status)
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+            print(f"❌ Échec du démarrage des workers: {self.error}")
+            return
+
+        errors = [status.get("error") for status in self.statuses if not status.get("ready")]
+        if errors:
+            self.error = "; ".join(str(error) for error in errors)
+            return
+        self.ready = True
+        print(f"✅ {self.size} workers de rendu prêts")
+
+    async def run(self, fn, *args):
+        """Exécute fn dans un worker ; un pool cassé (worker tué) est recréé et repréchauffé"""
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # Plusieurs rendus peuvent échouer ensemble : un seul redémarrage par pool cassé
+            if self.executor is executor:
+                print("⚠️ Pool de workers cassé, redémarrage...")
+                self.ready = False
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = self._create_executor()
+                asyncio.ensure_future(self._warm())
+            raise
+
+    async def render(self, request_data: dict, uploaded_videos: dict, output_path: str, **options) -> str:
+        """options : width, height, profile, start, end, audio, progressive (voir renderer.render_composition)"""
+        return await self.run(_render, request_data, uploaded_videos, output_path, options)
+
+    async def render_audio(self, request_data: dict, uploaded_videos: dict, output_path: str,
+                           duration: float, profile: dict) -> str:
+        return await self.run(_render_audio, request_data, uploaded_videos, output_path, duration, profile)
+
+    async def composition_extent(self, request_data: dict, uploaded_videos: dict) -> float:
+        return await self.run(_composition_extent, request_data, uploaded_videos)
+
+    async def render_batch(self, jobs: List[dict], uploaded_videos: dict) -> List[str]:
+        return await self.run(_render_batch, jobs, uploaded_videos)
+
+    async def index_library(self, clips_dir: str) -> dict:
+        return await self.run(_index_library, clips_dir)
+
+    async def index_uploads(self, paths: List[str]) -> int:
+        return await self.run(_index_uploads, paths)
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def health(self) -> dict:
+        return {
+            "ready": self.ready,
+            "workers": self.size,
+            "statuses": self.statuses,
+            "error": self.error,
+        }
+
+
+# Imports locaux : renderer (et MoviePy) ne sont chargés que dans les workers
+
+def _warm_up(warm_queue):
+    import renderer
+    warm_queue.put(renderer.warm_up())
+
+
+def _noop():
+    pass
+
+
+def _render(request_data: dict, uploaded_videos: dict, output_path: str, options: dict) -> str:
+    import renderer
+    return renderer.render_composition(request_data, uploaded_videos, output_path, **options)
+
+
+def _render_audio(request_data: dict, uploaded_videos: dict, output_path: str, duration: float, profile: dict) -> str:
+    import renderer
+    return renderer.render_audio(request_data, uploaded_videos, output_path, duration, profile)
+
+
+def _composition_extent(request_data: dict, uploaded_videos: dict) -> float:
+    import renderer
+    return renderer.composition_extent(request_data, uploaded_videos)
+
+
+def _render_batch(jobs: list, uploaded_videos: dict) -> list:
+    import renderer
+    return renderer.render_batch(jobs, uploaded_videos)
+
+
+def _index_library(clips_dir: str) -> dict:
+    import indexer
+    return indexer.index_library(clips_dir)
+
+
+def _index_uploads(paths: list) -> int:
+    import indexer
+    return indexer.index_uploads(paths)
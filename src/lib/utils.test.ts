@@ -1,5 +1,5 @@
 import { describe, it, expect } from 'vitest';
-import { formatDate, formatTime, isSameDay } from './utils';
+import { formatDate, formatTime, isSameDay, clipThumbnailUrl } from './utils';
 
 describe('formatDate', () => {
 	it('should format date correctly', () => {
@@ -42,3 +42,13 @@ describe('isSameDay', () => {
 		expect(isSameDay(date1, date2)).toBe(false);
 	});
 });
+
+describe('clipThumbnailUrl', () => {
+	it('should return the thumbnail URL of a library clip', () => {
+		expect(clipThumbnailUrl('/api/clips/kick.mp4')).toBe('/api/clips/kick.mp4/thumbnail');
+	});
+
+	it('should return undefined for local files', () => {
+		expect(clipThumbnailUrl('blob:http://localhost:5173/1234')).toBeUndefined();
+	});
+});
@@ -29,3 +29,12 @@ export function isSameDay(date1: Date, date2: Date): boolean {
 		date1.getDate() === date2.getDate()
 	);
 }
+
+/**
+ * Thumbnail URL for a library clip (generated by the render service index),
+ * or undefined for local files (blob URLs)
+ */
+export function clipThumbnailUrl(videoUrl: string): string | undefined {
+	const match = videoUrl.match(/^\/api\/clips\/([^/?#]+)$/);
+	return match ? `/api/clips/${match[1]}/thumbnail` : undefined;
+}
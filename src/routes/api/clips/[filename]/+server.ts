@@ -1,32 +1,65 @@
 import { error } from '@sveltejs/kit';
-import { readFile } from 'fs/promises';
+import { createReadStream } from 'fs';
+import { stat } from 'fs/promises';
 import { join } from 'path';
+import { Readable } from 'stream';
 
-export async function GET({ params }) {
+export async function GET({ params, request }) {
+	const { filename } = params;
+	const clipsDir = join(process.cwd(), 'clips');
+	const filePath = join(clipsDir, filename);
+
+	// Sécurité : empêcher l'accès en dehors du répertoire clips
+	if (!filePath.startsWith(clipsDir)) {
+		throw error(403, 'Forbidden');
+	}
+
+	let size: number;
 	try {
-		const { filename } = params;
-		const clipsDir = join(process.cwd(), 'clips');
-		const filePath = join(clipsDir, filename);
+		const stats = await stat(filePath);
+		if (!stats.isFile()) throw new Error('Not a file');
+		size = stats.size;
+	} catch (err) {
+		throw error(404, 'File not found');
+	}
 
-		// Sécurité : empêcher l'accès en dehors du répertoire clips
-		if (!filePath.startsWith(clipsDir)) {
-			throw error(403, 'Forbidden');
-		}
+	// Déterminer le type MIME
+	let contentType = 'video/mp4';
+	if (filename.endsWith('.webm')) contentType = 'video/webm';
+	if (filename.endsWith('.mov')) contentType = 'video/quicktime';
 
-		const fileBuffer = await readFile(filePath);
+	const headers: Record<string, string> = {
+		'Content-Type': contentType,
+		'Accept-Ranges': 'bytes'
+	};
 
-		// Déterminer le type MIME
-		let contentType = 'video/mp4';
-		if (filename.endsWith('.webm')) contentType = 'video/webm';
-		if (filename.endsWith('.mov')) contentType = 'video/quicktime';
+	// Requête partielle : le navigateur ne lit que les métadonnées et les plages qu'il affiche
+	const range = request.headers.get('range')?.match(/^bytes=(\d*)-(\d*)$/);
+	if (range && (range[1] || range[2])) {
+		let start = range[1] ? Number(range[1]) : size - Number(range[2]);
+		let end = range[1] && range[2] ? Number(range[2]) : size - 1;
+		start = Math.max(0, start);
+		end = Math.min(end, size - 1);
+		if (start > end) {
+			return new Response(null, {
+				status: 416,
+				headers: { 'Content-Range': `bytes */${size}` }
+			});
+		}
 
-		return new Response(fileBuffer, {
+		const stream = createReadStream(filePath, { start, end });
+		return new Response(Readable.toWeb(stream) as ReadableStream, {
+			status: 206,
 			headers: {
-				'Content-Type': contentType,
-				'Accept-Ranges': 'bytes'
+				...headers,
+				'Content-Length': String(end - start + 1),
+				'Content-Range': `bytes ${start}-${end}/${size}`
 			}
 		});
-	} catch (err) {
-		throw error(404, 'File not found');
 	}
+
+	const stream = createReadStream(filePath);
+	return new Response(Readable.toWeb(stream) as ReadableStream, {
+		headers: { ...headers, 'Content-Length': String(size) }
+	});
 }
@@ -0,0 +1,29 @@
+import { error } from '@sveltejs/kit';
+import { readFile } from 'fs/promises';
+import { join } from 'path';
+
+// Vignette générée par l'index des médias du service de rendu (clips/.index/<fichier>/thumb.jpg)
+export async function GET({ params }) {
+	const { filename } = params;
+	const indexDir = join(process.cwd(), 'clips', '.index');
+	const thumbnailPath = join(indexDir, filename, 'thumb.jpg');
+
+	// Sécurité : empêcher l'accès en dehors du répertoire de l'index
+	if (!thumbnailPath.startsWith(indexDir + '/')) {
+		throw error(403, 'Forbidden');
+	}
+
+	let thumbnail: Buffer;
+	try {
+		thumbnail = await readFile(thumbnailPath);
+	} catch (err) {
+		throw error(404, 'Thumbnail not found');
+	}
+
+	return new Response(new Uint8Array(thumbnail), {
+		headers: {
+			'Content-Type': 'image/jpeg',
+			'Cache-Control': 'public, max-age=300'
+		}
+	});
+}